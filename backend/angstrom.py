@@ -5,7 +5,7 @@ from datetime import datetime
 import ciso8601
 
 from bs4 import BeautifulSoup
-import requests
+from backend import client
 from requests.exceptions import ReadTimeout
 
 class BackEnd:
@@ -37,7 +37,7 @@ class BackEnd:
         self.log.info(f"Attempting to use angstrom instance at {self.URL}")
 
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
 
         # The same web system hosts historic competitions as well.
         # They appear to be numbered.
@@ -110,6 +110,7 @@ class BackEnd:
 
     def _get_solves(self, challenge_id):
         failed = False
+        resp = None
 
         try:
             resp = self.session.get(self.API + f"/competitions/{self.competition}/challenges/{challenge_id}")
@@ -120,7 +121,8 @@ class BackEnd:
 
         if failed or resp.status_code not in [ 200, 304 ]:
             self.log.warning("Chall solves fetch failed")
-            self.log.warning(resp.text)
+            if resp is not None:
+                self.log.warning(client.excerpt(resp))
             return []
 
         if "solves" not in chall_stats:
@@ -165,13 +167,22 @@ class BackEnd:
         failed = False
 
         try:
-            resp = self.session.get(self.API + f"/competitions/{self.competition}/teams")
-            resp.encoding = "utf-8"
-            sc_list = resp.json()
+            resp = self.session.get(self.API + f"/competitions/{self.competition}/teams", conditional=True)
         except:
             failed = True
 
-        if failed or resp.status_code not in [ 200, 304 ]:
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
+        if not failed:
+            try:
+                resp.encoding = "utf-8"
+                sc_list = resp.json()
+            except:
+                failed = True
+
+        if failed or resp.status_code != 200:
             self.log.warning("Scoreboard fetch failed")
             #self.log.warning(resp.text)
             return None
@@ -0,0 +1,411 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# The HTTP client every backend uses to talk to its CTF server.
+#
+# It's a requests.Session, so backends use it just like one, but:
+#  - All clients share the same connection pools, one per host, so a
+#    connection is kept alive between polls (and between the backends
+#    when following several CTFs, and the autodetection before that).
+#  - Compressed responses are asked for.
+#  - Every request has a timeout, so one hung socket can't stall a backend
+#    forever. Backends may still pass their own.
+#  - Every request is timed, per host.
+#  - GETs made with conditional=True send the ETag and Last-Modified of the
+#    last response from the same URL back to the server. If nothing has
+#    changed, the server answers 304 Not Modified without a body, and the
+#    backend can skip parsing and sending the same snapshot again.
+#    Plenty of servers don't bother with validators, so the client also
+#    keeps a digest of the last body from each of those URLs, and a body
+#    which is exactly the same as last time counts as unchanged too.
+#    Backends check for either with unchanged(resp).
+#  - Idempotent requests which fail on the way (connection errors, timeouts,
+#    5xx and 429) are retried a few times, with jittered exponential backoff.
+#  - Every host has a circuit breaker. After a number of failures in a row,
+#    requests to the host fail right away with CircuitOpen instead of adding
+#    to its load, except for one probe every now and then, which comes less
+#    and less often for as long as the host stays down.
+#  - Every host has a token bucket, shared by all clients, which limits the
+#    rate of requests to it. Backends which fetch the solves of every
+#    challenge one by one would otherwise fire them off back to back, which
+#    is a good way to get rate limited or banned in the middle of a CTF.
+
+try:
+    import brotli
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# Seconds to wait for a connection, and for data once connected
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+# The answer to a conditional request when nothing has changed
+NOT_MODIFIED = 304
+
+# Retries of a failed request, and the backoff before the first one,
+# which doubles for each retry up to the cap
+RETRIES = 2
+RETRY_BACKOFF = 1.0
+RETRY_CAP = 30
+
+# Only these are safe to send twice
+IDEMPOTENT = { "GET", "HEAD", "OPTIONS" }
+
+# Answers which mean "try again later"
+RETRY_STATUS = { 429, 500, 502, 503, 504 }
+
+# Failures in a row before a host's breaker opens, and the time until the
+# first probe after that. The time doubles for every failed probe.
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+BREAKER_COOLDOWN_CAP = 600
+
+# Requests per second to each host, and how many may be sent at once
+# after a quiet spell
+RATE_LIMIT = 5
+RATE_BURST = 10
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    pass
+
+# The pools are shared between every client in the process
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=8)
+
+# Request timings and the outcome of conditional requests, per host
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _new_stats():
+    return {
+        "requests": 0,
+        "seconds": 0.0,
+        "last": 0.0,
+        "conditional": 0,
+        "not_modified": 0,
+        "same_body": 0,
+        "retries": 0,
+        "rejected": 0,
+        "throttled": 0,
+        "wait_seconds": 0.0,
+        "max_wait": 0.0,
+    }
+
+def _count(host, counter):
+    with _stats_lock:
+        _stats.setdefault(host, _new_stats())[counter] += 1
+
+# host -> the counters above, plus skip_rate: the fraction of the
+# conditional requests which turned out not to need parsing,
+# and the state of the host's circuit breaker
+def stats():
+    with _stats_lock:
+        ret = {}
+        for host,s in _stats.items():
+            ret[host] = dict(s)
+            skipped = s["not_modified"] + s["same_body"]
+            ret[host]["skip_rate"] = skipped / s["conditional"] if s["conditional"] > 0 else 0.0
+
+    with _breakers_lock:
+        for host,breaker in _breakers.items():
+            ret.setdefault(host, {})["breaker"] = breaker.state()
+
+    return ret
+
+# True if a conditional request got nothing new, so there's nothing to parse
+def unchanged(resp):
+    return resp.status_code == NOT_MODIFIED or getattr(resp, "same_body", False)
+
+def _digest(body):
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+# A short piece of a response, for the log. Some servers answer
+# errors with whole HTML pages, which we don't want to see every poll.
+def excerpt(resp, length=200):
+    text = resp.text
+    if len(text) > length:
+        text = text[:length] + f"... ({len(text)} characters)"
+    return f"HTTP {resp.status_code} from {resp.url}: {text!r}"
+
+class Breaker:
+    def __init__(self, host, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+
+        self.log = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+
+        # Failures in a row
+        self.failures = 0
+
+        # None while closed. While open, when the next probe may go out.
+        self.open_until = None
+        self.wait = cooldown
+
+    def state(self):
+        return "closed" if self.open_until is None else "open"
+
+    # True if a request may be sent
+    def allow(self):
+        with self.lock:
+            if self.open_until is None:
+                return True
+
+            now = self.clock()
+            if now < self.open_until:
+                return False
+
+            # Let this one through to see if the host is back,
+            # and nothing else until it has had time to answer
+            self.open_until = now + self.wait
+            return True
+
+    def success(self):
+        with self.lock:
+            if self.open_until is not None:
+                self.log.info(f"{self.host} is answering again")
+
+            self.failures = 0
+            self.open_until = None
+            self.wait = self.cooldown
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+
+            if self.open_until is not None:
+                # The probe failed too
+                self.wait = min(self.wait * 2, max(self.cooldown, BREAKER_COOLDOWN_CAP))
+                self.open_until = self.clock() + self.wait
+
+            elif self.failures >= self.threshold:
+                self.log.warning(f"{self.host} failed {self.failures} times in a row. Backing off for {self.wait} s.")
+                self.open_until = self.clock() + self.wait
+
+# Shared by every client, like the connection pools, host -> Breaker
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def _breaker(host, threshold, cooldown):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = Breaker(host, threshold, cooldown)
+            _breakers[host] = breaker
+        return breaker
+
+class TokenBucket:
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self.sleep = sleep
+
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.last = clock()
+
+    # Blocks until a request may be sent, and returns how many seconds that took.
+    # The token is taken right away, even if it isn't there yet, so threads
+    # waiting at the same time get consecutive slots instead of all waking
+    # up together.
+    def take(self):
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+# host -> TokenBucket
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def _bucket(host, rate, burst):
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst)
+            _buckets[host] = bucket
+        return bucket
+
+class Client(requests.Session):
+    def __init__(self, conf=None):
+        super().__init__()
+
+        if conf is None:
+            conf = {}
+
+        self.log = logging.getLogger(__name__)
+
+        self.timeout = (conf.get("connect-timeout", CONNECT_TIMEOUT),
+                        conf.get("read-timeout", READ_TIMEOUT))
+
+        self.retries = conf.get("http-retries", RETRIES)
+        self.backoff = conf.get("retry-backoff", RETRY_BACKOFF)
+        self.breaker_threshold = conf.get("breaker-threshold", BREAKER_THRESHOLD)
+        self.breaker_cooldown = conf.get("breaker-cooldown", BREAKER_COOLDOWN)
+        self.rate_limit = conf.get("rate-limit", RATE_LIMIT)
+        self.rate_burst = conf.get("rate-burst", RATE_BURST)
+
+        self.mount("https://", _adapter)
+        self.mount("http://", _adapter)
+        self.headers.update({ "Accept-Encoding": ACCEPT_ENCODING })
+
+        # The validators of the last response to each conditional request,
+        # (url, params) -> headers to send next time
+        self.validators = {}
+
+        # And the digest of its body, (url, params) -> digest
+        self.digests = {}
+
+    def request(self, method, url, conditional=False, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        host = urlsplit(url).netloc
+
+        key = None
+        if conditional:
+            key = (url, repr(kwargs.get("params")))
+            cached = self.validators.get(key)
+            if cached is not None:
+                kwargs["headers"] = { **cached, **(kwargs.get("headers") or {}) }
+
+        breaker = _breaker(host, self.breaker_threshold, self.breaker_cooldown)
+
+        bucket = None
+        if self.rate_limit > 0:
+            bucket = _bucket(host, self.rate_limit, self.rate_burst)
+
+        retries = self.retries if method.upper() in IDEMPOTENT else 0
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                _count(host, "rejected")
+                raise CircuitOpen(f"Not sending {method} {url}, {host} is down")
+
+            if bucket is not None:
+                self._waited(host, bucket.take())
+
+            resp = None
+            error = None
+            start = time.perf_counter()
+            try:
+                resp = super().request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            finally:
+                elapsed = time.perf_counter() - start
+                self._record(host, elapsed)
+                self.log.debug(f"{method} {url} took {elapsed:.3f} s")
+
+            if error is None and resp.status_code not in RETRY_STATUS:
+                breaker.success()
+                break
+
+            breaker.failure()
+            if attempt >= retries:
+                break
+
+            delay = self._backoff(attempt, resp)
+            self.log.debug(f"{method} {url} failed, retrying in {delay:.1f} s")
+            _count(host, "retries")
+            time.sleep(delay)
+            attempt += 1
+
+        if error is not None:
+            raise error
+
+        if key is not None and resp.status_code == 200:
+            self._remember(key, resp)
+
+        if key is not None:
+            self._count_conditional(host, resp)
+
+        return resp
+
+    # Seconds to wait before a retry: anywhere up to the exponential backoff,
+    # so that clients which failed together don't all come back together.
+    # A server which tells us how long to wait gets at least that.
+    def _backoff(self, attempt, resp):
+        delay = random.uniform(0, min(RETRY_CAP, self.backoff * 2**attempt))
+
+        if resp is not None:
+            try:
+                delay = max(delay, min(RETRY_CAP, float(resp.headers["Retry-After"])))
+            except (KeyError, ValueError):
+                pass
+
+        return delay
+
+    # Keeps whatever the server gave us to check for changes with
+    def _remember(self, key, resp):
+        digest = _digest(resp.content)
+        resp.same_body = self.digests.get(key) == digest
+        self.digests[key] = digest
+
+        if resp.same_body:
+            self.log.debug(f"{resp.url} is the same as last time")
+
+        cached = {}
+        if "ETag" in resp.headers:
+            cached["If-None-Match"] = resp.headers["ETag"]
+        if "Last-Modified" in resp.headers:
+            cached["If-Modified-Since"] = resp.headers["Last-Modified"]
+
+        if len(cached) > 0:
+            self.validators[key] = cached
+        else:
+            self.validators.pop(key, None)
+
+    def _record(self, host, elapsed):
+        with _stats_lock:
+            s = _stats.setdefault(host, _new_stats())
+            s["requests"] += 1
+            s["seconds"] += elapsed
+            s["last"] = elapsed
+
+    def _waited(self, host, wait):
+        if wait <= 0:
+            return
+
+        with _stats_lock:
+            s = _stats.setdefault(host, _new_stats())
+            s["throttled"] += 1
+            s["wait_seconds"] += wait
+            s["max_wait"] = max(s["max_wait"], wait)
+
+    def _count_conditional(self, host, resp):
+        with _stats_lock:
+            s = _stats.setdefault(host, _new_stats())
+            s["conditional"] += 1
+            if resp.status_code == NOT_MODIFIED:
+                s["not_modified"] += 1
+            elif getattr(resp, "same_body", False):
+                s["same_body"] += 1
+
+# For one-off requests, like the autodetection in supports()
+_default = None
+
+def get(url, **kwargs):
+    global _default
+    if _default is None:
+        _default = Client()
+    return _default.get(url, **kwargs)
@@ -6,8 +6,8 @@ from datetime import datetime
 from copy import deepcopy as CP
 
 from bs4 import BeautifulSoup
-import requests
-from requests.exceptions import ReadTimeout
+from backend import client
+from requests.exceptions import RequestException
 
 class BackEnd:
 
@@ -23,7 +23,7 @@ class BackEnd:
     @staticmethod
     def supports(conf, url):
         try:
-            resp = requests.get(url, timeout=2)
+            resp = client.get(url, timeout=2)
         except:
             return False
 
@@ -52,7 +52,7 @@ class BackEnd:
         self.log.info(f"Attempting to use CTFd instance at {self.base_URL}")
 
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
         self.authenticated = False
         self.authtoken = ""
 
@@ -206,14 +206,14 @@ class BackEnd:
 
         try:
             resp = self.session.get(self.solve_URL(challenge_id), timeout=15)
-        except ReadTimeout:
+        except RequestException:
             return None
 
         try:
             msg = resp.json()
         except:
             self.log.warning("Solves fetch failed:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
             return None
 
         if not ("teams" in msg):
@@ -232,19 +232,19 @@ class BackEnd:
 
         try:
             resp = self.session.get(self.challenges_URL, timeout = 30)
-        except ReadTimeout:
+        except RequestException:
             return None
 
         if resp.status_code != 200:
             self.log.warning("chall fetch failed:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
             return None
 
         try:
             msg = resp.json()
         except:
             self.log.warning("Chall fetch failed:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
             return None
 
         if not ("game" in msg):
@@ -288,10 +288,14 @@ class BackEnd:
         # Handy dandy matrix of everything
         # Sadly, we have to parse the table, but that's allright
         try:
-            resp = self.session.get(self.scoreboard_URL)
+            resp = self.session.get(self.scoreboard_URL, conditional=True)
         except:
             failed = True
 
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
         if failed or resp.status_code != 200:
             self.log.warning("Chall fetch failed")
             return None
@@ -339,10 +343,14 @@ class BackEnd:
     def _get_scoreboard_api(self):
         failed = False
         try:
-            resp = self.session.get(self.scoreboard_URL)
+            resp = self.session.get(self.scoreboard_URL, conditional=True)
         except:
             failed = True
 
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
         if failed or resp.status_code != 200:
             self.log.error("Scoreboard fetch failed")
             return None
@@ -375,14 +383,14 @@ class BackEnd:
 
         try:
             resp = self.session.get(self.solve_URL(challenge_id), timeout=15)
-        except ReadTimeout:
+        except RequestException:
             return None
 
         try:
             msg = resp.json()
         except:
             self.log.warning("Solves fetch failed:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
             return None
 
         if not ("success" in msg and msg["success"] == True):
@@ -401,19 +409,19 @@ class BackEnd:
 
         try:
             resp = self.session.get(self.challenges_URL, timeout = 30)
-        except ReadTimeout:
+        except RequestException:
             return None
 
         if resp.status_code != 200:
             self.log.warning("chall fetch failed:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
             return None
 
         try:
             msg = resp.json()
         except:
             self.log.warning("Chall fetch failed:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
             return None
 
         if not ("success" in msg and msg["success"] == True):
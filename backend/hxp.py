@@ -4,7 +4,7 @@ import time
 from datetime import datetime
 
 from bs4 import BeautifulSoup
-import requests
+from backend import client
 from requests.exceptions import ReadTimeout
 
 class BackEnd:
@@ -19,7 +19,7 @@ class BackEnd:
     @staticmethod
     def supports(conf, url):
         # Return True if the url seems like a system we support
-        resp = requests.get(url)
+        resp = client.get(url)
 
         soup = BeautifulSoup(resp.text, "html.parser")
 
@@ -45,7 +45,7 @@ class BackEnd:
         self.URL = self._baseurl(conf["url"])
         self.log.info(f"Attempting to use hxp instance at {self.URL}")
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
 
 
     def run(self):
@@ -87,10 +87,14 @@ class BackEnd:
         # Handy dandy matrix of everything
         # Sadly, we have to parse the table, but that's allright
         try:
-            resp = self.session.get(self.URL + "/public/scoreboard/max/")
+            resp = self.session.get(self.URL + "/public/scoreboard/max/", conditional=True)
         except:
             failed = True
 
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
         if failed or resp.status_code != 200:
             self.log.warning("Chall fetch failed")
             return None
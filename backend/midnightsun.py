@@ -4,7 +4,7 @@ import time
 from datetime import datetime
 
 from bs4 import BeautifulSoup
-import requests
+from backend import client
 from requests.exceptions import ReadTimeout
 
 class BackEnd:
@@ -33,7 +33,7 @@ class BackEnd:
         self.URL = self._baseurl(conf["url"])
         self.log.info(f"Attempting to use midnightsun instance at {self.URL}")
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
 
 
     def run(self):
@@ -70,10 +70,14 @@ class BackEnd:
         # Handy dandy matrix of everything
         # Sadly, we have to parse the table, but that's allright
         try:
-            resp = self.session.get(self.URL + "/dashboard/scoreboard")
+            resp = self.session.get(self.URL + "/dashboard/scoreboard", conditional=True)
         except:
             failed = True
 
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
         if failed or resp.status_code != 200:
             self.log.warning("Scoreboard fetch failed")
             return None
@@ -4,7 +4,7 @@ import time
 from datetime import datetime
 
 from bs4 import BeautifulSoup
-import requests
+from backend import client
 from requests.exceptions import ReadTimeout
 
 class BackEnd:
@@ -19,7 +19,7 @@ class BackEnd:
     @staticmethod
     def supports(conf, url):
         # Return True if the url seems like a system we support
-        resp = requests.get(url)
+        resp = client.get(url)
 
         # This is in the footer of every page
         return "Milkdrop/CTFx" in resp.text
@@ -37,7 +37,7 @@ class BackEnd:
         self.URL = self._baseurl(conf["url"])
         self.log.info(f"Attempting to use hxp instance at {self.URL}")
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
 
 
     def run(self):
@@ -74,10 +74,14 @@ class BackEnd:
         # Handy dandy matrix of everything
         # Sadly, we have to parse the table, but that's allright
         try:
-            resp = self.session.get(self.URL + "/scoreboard")
+            resp = self.session.get(self.URL + "/scoreboard", conditional=True)
         except:
             failed = True
 
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
         if failed or resp.status_code != 200:
             self.log.warning("Chall fetch failed")
             return None
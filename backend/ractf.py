@@ -5,7 +5,7 @@ import hashlib
 import urllib.parse
 
 from bs4 import BeautifulSoup
-import requests
+from backend import client
 from requests.exceptions import ReadTimeout
 
 class BackEnd:
@@ -26,7 +26,7 @@ class BackEnd:
         # The best heuristic I've found is the RACTF credit embedded in one
         # of the javascript blobs.
         for js_url in BackEnd._jsurls(url):
-            js_resp = requests.get(js_url)
+            js_resp = client.get(js_url)
             if "RACTF" in js_resp.text:
                 return True
 
@@ -48,7 +48,7 @@ class BackEnd:
     def _jsurls(url):
 
         url_base = BackEnd._baseurl(url)
-        resp = requests.get(url)
+        resp = client.get(url)
 
         soup = BeautifulSoup(resp.text, "html.parser")
 
@@ -69,7 +69,7 @@ class BackEnd:
 
         # This works for RaRCTF 2021
         if True:
-            resp = requests.get(BackEnd._baseurl(url))
+            resp = client.get(BackEnd._baseurl(url))
             api_re = re.compile(".*apiDomain:'([^']+)'.*")
             match = api_re.match(resp.text)
             if match is not None:
@@ -79,7 +79,7 @@ class BackEnd:
         if True:
             api_re = re.compile(".*\"(https://[^\"]+/api/v2)\".*")
             for js_url in BackEnd._jsurls(url):
-                js_resp = requests.get(js_url)
+                js_resp = client.get(js_url)
                 match = api_re.match(js_resp.text)
                 if match is not None:
                     return match.groups(1)[0]
@@ -103,7 +103,7 @@ class BackEnd:
         self.URL = self._apiurl(BackEnd._baseurl(conf["url"]))
         self.log.info(f"Attempting to use RACTF instance at {self.URL}")
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
 
 
     def run(self):
@@ -130,10 +130,14 @@ class BackEnd:
 
         failed = False
         try:
-            resp = self.session.get(self.URL + "/leaderboard/team/?limit=1000")
+            resp = self.session.get(self.URL + "/leaderboard/team/?limit=1000", conditional=True)
         except:
             failed = True
 
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
         if failed or resp.status_code != 200:
             self.log.warning("scoreboard fetch failed:")
             #self.log.warning(resp.text)
@@ -143,11 +147,11 @@ class BackEnd:
 
         if "d" not in data:
             self.log.warning("scoreboard format unexpected:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
 
         if "results" not in data["d"]:
             self.log.warning("scoreboard format unexpected:")
-            self.log.warning(resp.text)
+            self.log.warning(client.excerpt(resp))
 
         for k,v in enumerate(data["d"]["results"]):
             t = {}
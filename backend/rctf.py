@@ -3,7 +3,7 @@ import re
 import time
 
 from copy import deepcopy as CP
-import requests
+from backend import client
 
 class BackEnd:
 
@@ -18,7 +18,7 @@ class BackEnd:
     @staticmethod
     def supports(conf, url):
         # Return True if the url seems like a system we support
-        resp = requests.get(url)
+        resp = client.get(url)
 
         # The web interface is quite obfuscated. This meta tag is on several pages, though.
         if "rctf-config" in resp.text:
@@ -38,7 +38,7 @@ class BackEnd:
         self.log.info(f"Attempting to use rCTF instance at {self.URL}")
 
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
         self.authenticated = False
         self.authtoken = ""
 
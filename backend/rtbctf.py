@@ -4,7 +4,7 @@ import time
 import hashlib
 
 from bs4 import BeautifulSoup
-import requests
+from backend import client
 from requests.exceptions import ReadTimeout
 
 class BackEnd:
@@ -19,7 +19,7 @@ class BackEnd:
     @staticmethod
     def supports(conf, url):
         # Return True if the url seems like a system we support
-        resp = requests.get(url)
+        resp = client.get(url)
 
         lcase = resp.text.lower()
         return "abs0lut3pwn4g3" in lcase
@@ -37,7 +37,7 @@ class BackEnd:
         self.URL = self._baseurl(conf["url"])
         self.log.info(f"Attempting to use RTB-CTF instance at {self.URL}")
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
 
 
     def run(self):
@@ -69,10 +69,14 @@ class BackEnd:
         # Sadly, we have to parse the table, but that's allright
         failed = False
         try:
-            resp = self.session.get(self.URL + "/scoreboard")
+            resp = self.session.get(self.URL + "/scoreboard", conditional=True)
         except:
             failed = True
 
+        # Nothing has changed since the last poll
+        if not failed and client.unchanged(resp):
+            return None
+
         if failed or resp.status_code != 200:
             self.log.warning("scoreboard fetch failed:")
             return None
@@ -6,7 +6,7 @@ import traceback
 import copy
 
 from bs4 import BeautifulSoup
-import requests
+from backend import client
 from requests.exceptions import ReadTimeout
 
 class BackEnd:
@@ -37,7 +37,16 @@ class BackEnd:
             raise RuntimeError("This backend requires a URL")
 
 
-        self.session = requests.Session()
+        self.session = client.Client(conf)
+
+        # After the first complete challenge listing, we only send on the
+        # solves that are newer than what we've already seen.
+        # These are the challenges we know of (challenge_id -> points),
+        # the newest solve time we know of, and the solves
+        # (challenge name, team_id) which happened at exactly that time.
+        self.known_challenges = None
+        self.newest_solve = None
+        self.solves_at_newest = set()
 
         try:
             self.URL = self._identify_api_server(conf["url"])
@@ -94,12 +103,15 @@ class BackEnd:
             stats = self._get_scoreboard_and_challenges()
 
             if stats is not None:
-                scoreboard,challs = stats
+                scoreboard,challs,patch = stats
 
                 if scoreboard is not None:
                     self.middle.handle_snapshot(("scoreboard", { "scores": scoreboard }))
 
-                if challs is not None:
+                if patch is not None:
+                    if len(patch) > 0:
+                        self.middle.handle_snapshot(("challenges_patch", { "challenges": patch }))
+                elif challs is not None:
                     self.middle.handle_snapshot(("challenges", { "challenges": challs }))
 
             time.sleep(self.conf["poll-interval"])
@@ -124,14 +136,16 @@ class BackEnd:
         # Handy dandy matrix of everything
         # Sadly, we have to parse the table, but that's allright
         try:
-            resp = self.session.get(self.URL + "/info-update")
+            resp = self.session.get(self.URL + "/info-update", conditional=True)
+            if client.unchanged(resp):
+                # Nothing has changed since the last poll
+                return None
             data = resp.json()
         except:
             failed = True
 
         if failed or resp.status_code != 200:
             self.log.warning("Chall fetch failed")
-            self.log.warning(resp)
             return None
 
         # Only visible to logged-in users
@@ -163,8 +177,53 @@ class BackEnd:
         challs = []
         for k,v in challs_by_name.items():
             c = copy.copy(v)
-            c["solves"] = [ team_id for time,team_id in sorted(v["solves"]) ]
+            c["solves"] = [ team_id for when,team_id in sorted(v["solves"]) ]
             challs.append(c)
 
-        return teams,challs
+        patch = self._solves_patch(challs_by_name, challs)
+
+        return teams,challs,patch
+
+    # The taskStats tell us when every solve happened, so we can pick out the
+    # new ones ourselves and let the middle-end skip the full solve lists.
+    # Returns None when the complete listing should be sent instead.
+    def _solves_patch(self, challs_by_name, challs):
+        if len(challs) == 0:
+            # Not logged in, or no challenges yet
+            return None
+
+        patch = None
+        if self.known_challenges is not None:
+            patch = []
+            for c in challs:
+                # A new challenge is sent in full
+                if c["challenge_id"] not in self.known_challenges:
+                    patch.append(c)
+                    continue
+
+                name = c["name"]
+                new_solves = [ (when,team_id) for when,team_id in challs_by_name[name]["solves"]
+                               if self.newest_solve is None or
+                                  when > self.newest_solve or
+                                  (when == self.newest_solve and (name,team_id) not in self.solves_at_newest) ]
+
+                # Scoring is dynamic, so the points change along with the solves
+                if len(new_solves) > 0 or c["points"] != self.known_challenges[c["challenge_id"]]:
+                    patch.append({ "challenge_id": c["challenge_id"],
+                                   "name": c["name"],
+                                   "categories": c["categories"],
+                                   "points": c["points"],
+                                   "new_solves": [ team_id for when,team_id in sorted(new_solves) ] })
+
+        # Remember where we are for next time
+        self.known_challenges = { c["challenge_id"]: c["points"] for c in challs }
+        for name,c in challs_by_name.items():
+            for when,team_id in c["solves"]:
+                if self.newest_solve is None or when > self.newest_solve:
+                    self.newest_solve = when
+                    self.solves_at_newest = set()
+                if when == self.newest_solve:
+                    self.solves_at_newest.add((name,team_id))
+
+        return patch
 
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# Time the middle-end's diff path on synthetic CTFs of various sizes.
+#
+# Each scenario feeds MiddleEnd.handle_snapshot() a series of snapshots,
+# with a frontend attached which ignores everything, and times every call
+# along with a look at the top of the scoreboard, like a frontend drawing it.
+# The total is broken down into
+#   sort:     keeping the scoreboard ranking up to date
+#   dispatch: handing events over to the frontends
+#   diff:     everything else (fingerprints, validation, comparisons, state)
+#
+# Every run appends one JSON line to the output file, so the results
+# can be compared with earlier runs (see --compare).
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from copy import deepcopy as CP
+
+import middleend.basic
+
+
+# A frontend which takes events and does nothing at all with them
+class NullFrontEnd:
+    def __init__(self):
+        self.events = 0
+
+    def handle_event(self, event):
+        self.events += 1
+
+
+# Generates a CTF and the snapshots a backend would send for it
+class SyntheticCTF:
+    def __init__(self, teams, challenges, seed=1337):
+        self.rand = random.Random(seed)
+
+        self.scores = { f"T{i}": 0 for i in range(teams) }
+        self.names = { tid: f"Team {tid}" for tid in self.scores }
+        self.solves = { f"C{i}": [] for i in range(challenges) }
+
+        # Everyone starts out with something, so there's an order to shake up
+        for tid in self.scores:
+            self.scores[tid] = self.rand.randrange(0, 10000)
+
+    def scoreboard(self):
+        ranking = sorted(self.scores.items(), key=lambda x: (-x[1], x[0]))
+        return ("scoreboard", { "scores": [
+                    { "team_id": tid, "name": self.names[tid], "score": score, "place": i+1 }
+                    for i,(tid,score) in enumerate(ranking)
+                ] })
+
+    def challenges(self):
+        return ("challenges", { "challenges": [
+                    { "challenge_id": cid, "name": f"Challenge {cid}", "points": 500,
+                      "categories": [ "pwn" ], "solves": list(solves) }
+                    for cid,solves in self.solves.items()
+                ] })
+
+    # A fraction of the teams score some points
+    def churn(self, rate):
+        for tid in self.rand.sample(list(self.scores), max(1, int(len(self.scores) * rate))):
+            self.scores[tid] += self.rand.randrange(1, 500)
+
+    # Turn the scoreboard upside down. Every single team moves.
+    def rank_storm(self):
+        top = max(self.scores.values())
+        for tid in self.scores:
+            self.scores[tid] = top - self.scores[tid] + 1
+
+    # Lots of teams solve lots of challenges at once
+    def solve_burst(self, rate):
+        teams = list(self.scores)
+        for cid,solves in self.solves.items():
+            known = set(solves)
+            for tid in self.rand.sample(teams, max(1, int(len(teams) * rate))):
+                if tid not in known:
+                    solves.append(tid)
+
+
+# Wraps a method on an object so that the time spent in it is added up
+class Stopwatch:
+    def __init__(self, obj, name):
+        self.total = 0.0
+        func = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - start
+
+        setattr(obj, name, timed)
+
+
+def make_middle(conf):
+    front = NullFrontEnd()
+    mid = middleend.basic.MiddleEnd(conf, front)
+    sort = [ Stopwatch(mid.state.ranking, "update"), Stopwatch(mid.state.ranking, "settle") ]
+    dispatch = Stopwatch(mid.outputs, "deliver")
+    return mid, front, sort, dispatch
+
+# Times each snapshot. setup(ctf) is called before building every one.
+def run_scenario(conf, ctf, setup, kind, repeat):
+    mid, front, sort, dispatch = make_middle(conf)
+
+    # Boot it up with the starting state
+    mid.handle_snapshot(CP(ctf.challenges()))
+    mid.handle_snapshot(CP(ctf.scoreboard()))
+
+    # Build all the snapshots first, so only the middle-end is timed
+    snapshots = []
+    for _ in range(repeat):
+        setup(ctf)
+        snapshots.append(ctf.scoreboard() if kind == "scoreboard" else ctf.challenges())
+        snapshots[-1] = CP(snapshots[-1])
+
+    timings = []
+    events = front.events
+    for snapshot in snapshots:
+        for watch in sort:
+            watch.total = 0.0
+        dispatch.total = 0.0
+
+        start = time.perf_counter()
+        mid.handle_snapshot(snapshot)
+        mid.top(10)
+        total = time.perf_counter() - start
+
+        sort_total = sum(watch.total for watch in sort)
+        timings.append({
+            "total": total,
+            "sort": sort_total,
+            "dispatch": dispatch.total,
+            "diff": total - sort_total - dispatch.total,
+        })
+
+    result = { "deliveries": (front.events - events) / repeat }
+    for phase in [ "total", "diff", "sort", "dispatch" ]:
+        values = [ t[phase] * 1000 for t in timings ]
+        result[f"{phase}_ms"] = {
+            "median": statistics.median(values),
+            "min": min(values),
+        }
+
+    return result
+
+SCENARIOS = {
+    # The same snapshot over and over, like most polls
+    "quiet":       ("scoreboard", lambda ctf: None),
+
+    "churn_1":     ("scoreboard", lambda ctf: ctf.churn(0.01)),
+    "churn_10":    ("scoreboard", lambda ctf: ctf.churn(0.10)),
+    "rank_storm":  ("scoreboard", lambda ctf: ctf.rank_storm()),
+    "solve_burst": ("challenges", lambda ctf: ctf.solve_burst(0.02)),
+}
+
+def run(args):
+    # The same settings ctfront.py uses, minus anything that touches the disk
+    # or runs in the background, so the whole path is timed in this thread.
+    conf = {
+        "reorder-events": True,
+        "batch-events": False,
+        "dispatch-queue": 0,
+    }
+
+    results = []
+    for teams in args.sizes:
+        repeat = args.repeat if teams < 10000 else max(1, args.repeat // 4)
+        for name in args.scenarios:
+            kind,setup = SCENARIOS[name]
+            ctf = SyntheticCTF(teams, args.challenges)
+
+            res = run_scenario(conf, ctf, setup, kind, repeat)
+            res.update({ "scenario": name, "teams": teams, "repeat": repeat })
+            results.append(res)
+
+            print(f"{name:12} {teams:6} teams: {res['total_ms']['median']:9.2f} ms"
+                  f"  (diff {res['diff_ms']['median']:.2f}, sort {res['sort_ms']['median']:.2f},"
+                  f" dispatch {res['dispatch_ms']['median']:.2f})", file=sys.stderr)
+
+    return {
+        "time": time.time(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+# Compares against the previous run in the output file.
+# Returns False if anything got slower than the threshold allows.
+def compare(previous, current, threshold):
+    before = { (r["scenario"], r["teams"]): r for r in previous["results"] }
+
+    ok = True
+    for r in current["results"]:
+        key = (r["scenario"], r["teams"])
+        if key not in before:
+            continue
+
+        old = before[key]["total_ms"]["median"]
+        new = r["total_ms"]["median"]
+        if old <= 0:
+            continue
+
+        ratio = new / old
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- slower"
+            ok = False
+        print(f"{key[0]:12} {key[1]:6} teams: {old:9.2f} -> {new:9.2f} ms ({ratio:.2f}x){flag}", file=sys.stderr)
+
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the middle-end diff path")
+
+    parser.add_argument("--sizes", type=int, nargs="*", default=[ 100, 1000, 10000, 50000 ],
+                        help="Numbers of teams to try")
+
+    parser.add_argument("--scenarios", type=str, nargs="*", default=list(SCENARIOS),
+                        choices=list(SCENARIOS),
+                        help="Scenarios to run")
+
+    parser.add_argument("--challenges", type=int, default=40,
+                        help="Number of challenges in the CTF")
+
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Snapshots per scenario (a quarter of this from 10k teams up)")
+
+    parser.add_argument("--output", "-o", type=str, default="bench_output.txt",
+                        help="File to append the results to, as a line of JSON")
+
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare with the last run in the output file, and fail if anything got slower")
+
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="How much slower counts as a regression with --compare")
+
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        try:
+            with open(args.output, "r") as f:
+                lines = [ line for line in f if line.strip() != "" ]
+            previous = json.loads(lines[-1])
+        except (OSError, IndexError, ValueError):
+            print(f"No earlier results in {args.output} to compare with", file=sys.stderr)
+
+    current = run(args)
+
+    with open(args.output, "a") as f:
+        f.write(json.dumps(current) + "\n")
+
+    if previous is not None:
+        if not compare(previous, current, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,12 +4,15 @@ import logging
 import argparse
 import os
 import json
+import signal
+import sys
 import threading
 
 from log import FuncHandler
 
 import frontend
 import middleend.basic
+import middleend.fanin
 import backend
 
 
@@ -123,6 +126,12 @@ def load_config():
     override(conf, "password", args.password, "")
     override(conf, "poll-interval", args.poll_interval, 60)
 
+    # Middle-end options
+    override(conf, "reorder-events", None, True)
+    override(conf, "batch-events", None, False)
+    override(conf, "dispatch-queue", None, 1000)
+    override(conf, "checkpoint-dir", None, "~/.ctfront/checkpoints")
+
     # Frontend options
     override(conf, "focus-teams", args.focus_teams, [])
     override(conf, "max-length", args.max_length, 20)
@@ -131,6 +140,26 @@ def load_config():
 
     return conf
 
+# The configurations of the CTFs listed under "ctfs" in the config,
+# as (name, conf). Each one is a set of backend options on top of the
+# main configuration. Empty if there's just the one CTF.
+def ctf_configs(conf):
+    ctfs = []
+    names = set()
+    for entry in conf.get("ctfs", []):
+        c = dict(conf)
+        del c["ctfs"]
+        c.update(entry)
+
+        name = c.get("name", c["url"])
+        while name in names:
+            name += "'"
+        names.add(name)
+
+        ctfs.append((name, c))
+
+    return ctfs
+
 def boot_thread(func):
     t = threading.Thread(target=func)
     t.daemon = True
@@ -170,11 +199,42 @@ def main():
 
     log.info("Log initialized")
 
-    middle = middleend.basic.MiddleEnd(conf, front)
+    # One middle-end per CTF, all of them talking to the same frontends
+    ctfs = ctf_configs(conf)
+    if len(ctfs) == 0:
+        middle = middleend.basic.MiddleEnd(conf, front)
+        middles = [ (conf, middle) ]
+    else:
+        middle = middleend.fanin.FanIn(conf, front)
+        middles = [ (c, middle.add(name, c)) for name,c in ctfs ]
+
+    # Start the middle-end before the (potentially slow) backend setup,
+    # so that a checkpointed scoreboard is shown right away.
+    middle.start()
 
-    back = backend.BACKENDS[conf["backend"]](conf, middle)
+    # Stopping the middle-end on the way out is what finishes the journal
+    # and saves the last checkpoint, so a SIGTERM gets the same treatment
+    # as a Ctrl-C.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
-    if back is None:
+    backs = []
+    try:
+        return run(front, middles, backs)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for back in backs:
+            if back is not None:
+                back.stop()
+        middle.stop()
+
+# Runs everything until the frontends are done.
+# The backends are added to backs as they are created.
+def run(front, middles, backs):
+    for c,m in middles:
+        backs.append(backend.BACKENDS[c["backend"]](c, m))
+
+    if None in backs:
         return 1
 
     threaded_frontends = []
@@ -194,9 +254,8 @@ def main():
     for f in threaded_frontends:
         frontend_threads.append(boot_thread(f.run))
 
-    # Backend also runs in its own thread
-    middle.start()
-    backend_thread = boot_thread(back.run)
+    # Each backend also runs in its own thread, polling on its own schedule
+    backend_threads = [ boot_thread(back.run) for back in backs ]
 
     # This is a special child, which cannot tolerate being anywhere except
     # the main main main thread. Fine.
@@ -206,8 +265,11 @@ def main():
     for t in frontend_threads:
         t.join()
 
-    backend_thread.join()
+    for t in backend_threads:
+        t.join()
+
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
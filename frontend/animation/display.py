@@ -184,9 +184,12 @@ class ScoreboardDisplay(Effect):
         self._limits(screen)
 
         self.teams = {}
+        self.title = None
 
-    def update_scores(self, teams):
+    # The title is shown above the table, if there is one
+    def update_scores(self, teams, title=None):
         self.teams = teams
+        self.title = title
 
     def reset(self):
         pass
@@ -296,6 +299,12 @@ class ScoreboardDisplay(Effect):
         x0 = max(0, x0)
         y0 = max(0, y0)
 
+        if self.title is not None:
+            y0 = max(y0, 2)
+            title = self._sanitize(str(self.title))[:w]
+            screen.print_at(title, max(0, (w - len(title)) // 2), max(0, y0 - 2),
+                            transparent=True, **self.attr["focused"])
+
         for r in range(len(table)):
             for c in range(len(columns)):
                 text,attr = table[r][c]
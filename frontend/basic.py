@@ -7,6 +7,10 @@ import time
 import ftfy
 import unicodedata
 
+from frontend.records import DisplayTeam
+from middleend.event import untag
+from middleend.subscription import Subscription
+
 
 # A frontend which just clears the terminal and prints the scoreboard
 class FrontEnd:
@@ -24,10 +28,25 @@ class FrontEnd:
     def __init__(self, conf):
         self.conf = conf
 
+        # The teams of each CTF we're following. Usually there's only one,
+        # which is None.
+        self.boards = {}
         self.teams = {}
 
         pass
 
+    # We only ever show the top of the scoreboard and the focused teams,
+    # and nothing about the challenges.
+    def subscription(self):
+        return Subscription(events=[ "new_team", "score", "place", "reorder" ],
+                            top=self.conf["max-length"],
+                            teams=self._team_is_focused)
+
+    def _team_is_focused(self, team):
+        for expr in self.conf["focus-teams"]:
+            if re.match(expr, team.get("name", "")) != None: return True
+        return False
+
     def run(self):
         self.running = True
         while self.running:
@@ -36,17 +55,35 @@ class FrontEnd:
 
     # An event from the middle-end about something that changed
     def handle_event(self, event):
+        ctf,event = untag(event)
+        self.teams = self.boards.setdefault(ctf, {})
+
+        msg,data = event
+
+        # A whole snapshot's worth of events. Apply them all,
+        # then redraw once.
+        if msg == "delta":
+            for ev in data["events"]:
+                self._apply_event(ev)
+        else:
+            self._apply_event(event)
+
+        self._redraw()
+
+    def _apply_event(self, event):
         msg,data = event
 
+        # Event data is read-only and shared with other frontends,
+        # so keep our own copy of each team.
         if msg == "boot":
             for t in data["scoreboard"]["scores"]:
                 tid = t["team_id"]
-                self.teams[tid] = t
+                self.teams[tid] = DisplayTeam(t)
                 self.teams[tid]["old_place"] = t["place"]
 
         if msg == "new_team":
             tid = data["team_id"]
-            self.teams[tid] = data
+            self.teams[tid] = DisplayTeam(data)
             self.teams[tid]["old_place"] = data["place"]
 
         if msg == "place":
@@ -55,13 +92,17 @@ class FrontEnd:
                 self.teams[tid]["place"] = data["place"]
                 self.teams[tid]["old_place"] = data["old_place"]
 
+        if msg == "reorder":
+            for tid,place in data["places"].items():
+                if tid in self.teams:
+                    self.teams[tid]["place"] = place
+                    self.teams[tid]["old_place"] = data["old_places"][tid]
+
         if msg == "score":
             tid = data["team_id"]
             if tid in self.teams:
                 self.teams[tid]["score"] = data["score"]
 
-        self._redraw()
-
     def _sanitize(self, text):
         cleaned = ftfy.fix_text(text, normalization="NFKC")
 
@@ -72,12 +113,21 @@ class FrontEnd:
 
 
     def _redraw(self):
-        ranking = [ (tid, t["place"]) for tid,t in self.teams.items() ]
+        # Clear screen
+        print("\033[2J")
+
+        for ctf,teams in self.boards.items():
+            if ctf is not None:
+                print(ctf)
+            self._print_board(teams)
+
+    def _print_board(self, teams):
+        ranking = [ (tid, t["place"]) for tid,t in teams.items() ]
         ranking = sorted(ranking, key=lambda x: x[1])
 
         table = []
         for tid,place in ranking:
-            team = self.teams[tid]
+            team = teams[tid]
 
             marker = " "
             if team["old_place"] > team["place"]: marker = "▲"
@@ -112,6 +162,4 @@ class FrontEnd:
             cropped = cropped[:boundary - len(focused)]
 
 
-        # Clear screen
-        print("\033[2J")
         print(tabulate(cropped + focused))
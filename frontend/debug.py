@@ -1,6 +1,8 @@
 import queue
 import time
 
+from middleend.event import thaw, untag
+
 
 # A frontend which only prints its events, nothing more
 class FrontEnd:
@@ -27,8 +29,20 @@ class FrontEnd:
     def run(self):
         while True:
             evt = self.events.get()
+
+            # Events from one of several CTFs
+            prefix = ""
+            ctf,evt = untag(evt)
+            if ctf is not None:
+                prefix = f"[{ctf}] "
+
             msg,data = evt
-            print(f"{msg}:  {data}"[:800])
+            if msg == "delta":
+                for sub_msg,sub_data in data["events"]:
+                    print(f"{prefix}{msg}/{sub_msg}:  {thaw(sub_data)}"[:800])
+                continue
+
+            print(f"{prefix}{msg}:  {thaw(data)}"[:800])
 
     # An event from the middle-end about something that changed
     def handle_event(self, event):
@@ -19,6 +19,8 @@ from asciimatics.exceptions import ResizeScreenError
 from frontend.animation.wipe import *
 from frontend.animation.util import *
 from frontend.animation.display import *
+from frontend.records import DisplayTeam, DisplayChallenge
+from middleend.event import untag
 
 # A frontend which uses asciimatics to draw with super fancy animations
 class FrontEnd:
@@ -26,7 +28,9 @@ class FrontEnd:
     def help():
         return [
                  "focus-teams: one or more teams (name) to always show",
-                 "max-length:   max length of scoreboard"
+                 "max-length:   max length of scoreboard",
+                 "show-ctf:     name of the CTF to show, when following several",
+                 "rotate-ctfs:  seconds between switching to the next CTF (0 = never)"
                ]
 
     @staticmethod
@@ -36,13 +40,19 @@ class FrontEnd:
     def __init__(self, conf):
         self.conf = conf
 
-        # Everything we know about the players
+        # When following several CTFs, the teams and challenges of each one.
+        # Only one of them is on display, the others are kept up to date
+        # in the background.
+        self.boards = {}
+        self.shown = conf.get("show-ctf", self._first_ctf())
+        self.rotate = conf.get("rotate-ctfs", 0)
+        self.rotated = time.time()
+
+        # Everything we know about the players (of the CTF on display)
         # This includes not only data from the middle-end, but
         # some of our own data as well.
-        self.teams = {}
-
         # Likewise, everything we know about the challenges
-        self.challenges = {}
+        self.teams,self.challenges = self._board(self.shown)
 
         # Incoming events from the middle-end
         # Also contains self-posted actions, like "redraw"
@@ -51,7 +61,29 @@ class FrontEnd:
         # A list of text line strings received as log text
         self.log_text = []
 
+    # The CTF on display unless told otherwise, the first one configured.
+    # None if there's only one, since its events aren't tagged.
+    def _first_ctf(self):
+        for entry in self.conf.get("ctfs", []):
+            return entry.get("name", entry.get("url", self.conf.get("url")))
+        return None
+
+    def _board(self, ctf):
+        if ctf not in self.boards:
+            self.boards[ctf] = ({}, {})
+        return self.boards[ctf]
+
+    # Switch the display to the next CTF we've heard from
+    def _rotate(self):
+        self.rotated = time.time()
+
+        ctfs = list(self.boards)
+        if len(ctfs) < 2:
+            return
 
+        self.shown = ctfs[(ctfs.index(self.shown) + 1) % len(ctfs)]
+        self.teams,self.challenges = self.boards[self.shown]
+        self._redraw()
 
     def run(self):
         self.running = True
@@ -135,6 +167,9 @@ class FrontEnd:
             if ev is not None:
                 self._parse_event(ev)
 
+            if self.rotate > 0 and time.time() - self.rotated >= self.rotate:
+                self._rotate()
+
 
     def _schedule_redraw(self):
         self.events.put(("redraw", None))
@@ -161,22 +196,54 @@ class FrontEnd:
             # It was an internal action
             return
 
-        elif msg == "boot":
+        ctf,event = untag(event)
+        msg,data = event
+
+        # Events of the other CTFs go to their boards, without
+        # switching the display over.
+        shown = ctf == self.shown
+        self.teams,self.challenges = self._board(ctf)
+        try:
+            # A whole snapshot's worth of events. Apply them all,
+            # then redraw once.
+            if msg == "delta":
+                changed = False
+                for ev in data["events"]:
+                    changed = self._apply_event(ev, shown) or changed
+            else:
+                changed = self._apply_event(event, shown)
+        finally:
+            self.teams,self.challenges = self._board(self.shown)
+
+        if changed and shown:
+            self._schedule_redraw()
+
+    # Update our state with an event from the middle-end.
+    # Animations are only played if the event is for the CTF on display.
+    # Returns False if the event was of no interest.
+    def _apply_event(self, event, shown=True):
+        msg,data = event
+
+        # Event data is read-only and shared with other frontends,
+        # so we keep our own copies of teams and challenges.
+        if msg == "boot":
             for t in data["scoreboard"]["scores"]:
                 tid = t["team_id"]
+                t = DisplayTeam(t)
                 t["name"] = self._sanitize(t["name"])
                 self.teams[tid] = t
                 self._team_add_stats(self.teams[tid])
             if "challenges" in data:
                 for c in data["challenges"]["challenges"]:
                     cid = c["challenge_id"]
-                    self.challenges[cid] = c
+                    self.challenges[cid] = self._copy_chall(c)
                     self._chall_add_stats(self.challenges[cid])
                     for tid in self.challenges[cid]["solves"]:
                         self._register_solve(cid, tid)
 
         elif msg == "new_team":
             tid = data["team_id"]
+            data = DisplayTeam(data)
             data["name"] = self._sanitize(data["name"])
             self.teams[tid] = data
             self.teams[tid]["old_place"] = data["place"]
@@ -190,6 +257,13 @@ class FrontEnd:
                 self.teams[tid]["old_place"] = data["old_place"]
                 self._team_add_stats(self.teams[tid])
 
+        elif msg == "reorder":
+            for tid,place in data["places"].items():
+                if tid in self.teams:
+                    self.teams[tid]["place"] = place
+                    self.teams[tid]["old_place"] = data["old_places"][tid]
+                    self._team_add_stats(self.teams[tid])
+
         elif msg == "score":
             tid = data["team_id"]
             if tid in self.teams:
@@ -200,22 +274,22 @@ class FrontEnd:
             cid = data["challenge_id"]
             tid = data["team_id"]
             self._register_solve(cid, tid)
-            if data["first"]:
+            if data["first"] and shown:
                 if tid in self.teams and cid in self.challenges:
                     self._animate_firstblood(self.challenges[cid], self.teams[tid])
 
         elif msg == "new_challenge":
             cid = data["challenge_id"]
-            self.challenges[cid] = data
+            self.challenges[cid] = self._copy_chall(data)
             self._chall_add_stats(self.challenges[cid])
             for tid in self.challenges[cid]["solves"]:
                 self._register_solve(cid, tid)
 
         else:
             # It was an unknown message from the middle-end. Nevermind
-            return
+            return False
 
-        self._schedule_redraw()
+        return True
 
     def _register_solve(self, cid, tid):
         if cid not in self.challenges:
@@ -248,6 +322,13 @@ class FrontEnd:
         if team["old_place"] > team["place"]:
             team["marker"] = "▲"
 
+    # A private, mutable copy of a challenge from the middle-end
+    def _copy_chall(self, chall):
+        chall = DisplayChallenge(chall)
+        if "solves" not in chall:
+            chall["solves"] = []
+        return chall
+
     # Add/calculate additional fields for our internal use
     def _chall_add_stats(self, chall):
         if "solves" not in chall:
@@ -262,7 +343,7 @@ class FrontEnd:
         return cleaned
 
     def _redraw(self):
-        self.display_score.update_scores(self.teams)
+        self.display_score.update_scores(self.teams, title=self.shown)
         scene = Scene([self.display_score], clear=True)
 
         self.screen.play([scene], repeat=False, stop_on_resize=True)
@@ -0,0 +1,24 @@
+from middleend.records import Team, Challenge
+
+# Writable versions of the middle-end's team and challenge records,
+# with slots for the extra fields the frontends keep track of.
+# Build one from an event's data to get a private copy.
+
+class DisplayTeam(Team):
+    __slots__ = ( "old_place", "firsts", "awards", "marker" )
+    FIELDS = Team.FIELDS + __slots__
+
+    def __setitem__(self, key, value):
+        self._set(key, value)
+
+class DisplayChallenge(Challenge):
+    __slots__ = ()
+
+    def _convert(self, key, value):
+        # We add solves to this one as they come in
+        if key == "solves":
+            return list(value)
+        return super()._convert(key, value)
+
+    def __setitem__(self, key, value):
+        self._set(key, value)
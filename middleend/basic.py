@@ -1,10 +1,31 @@
 import logging
-
-from copy import deepcopy as CP
+import queue
+import threading
+import time
+
+from types import MappingProxyType
+
+from middleend.checkpoint import Checkpoint, checkpoint_path
+from middleend.event import freeze, thaw
+from middleend.history import History
+from middleend.normalize import Normalizer
+from middleend.schema import Validator
+from middleend.output import Outputs
+from middleend.records import Team, Challenge
+from middleend.state import State
+
+# A cheap fingerprint of a snapshot row.
+# The backends build their rows the same way every time,
+# so identical data gives an identical repr.
+def fingerprint(row):
+    return hash(repr(row))
 
 class MiddleEnd:
-    def __init__(self, conf, frontends):
+    # When following several CTFs, each one gets a MiddleEnd of its own,
+    # named by ctf, and they all share the same outputs to the frontends.
+    def __init__(self, conf, frontends, ctf=None, outputs=None):
         self.conf = conf
+        self.ctf = ctf
 
         self.log = logging.getLogger(__name__)
 
@@ -18,43 +39,204 @@ class MiddleEnd:
         self.frontends = frontends
         self.booted = False
 
-        # The internal CTF snapshot
-        self.ctfstate = {
-            "scoreboard": {
-                "scores": []
-            },
-
-            "challenges": {
-                "challenges": []
-            }
-
+        # Send a single "reorder" event per scoreboard instead of
+        # one "place" event for every team that moved
+        self.reorder_events = conf.get("reorder-events", False)
+
+        # Collect all the events from a snapshot into a single "delta" event
+        self.batch_events = conf.get("batch-events", False)
+        self.batch = None
+
+        # The frontends' subscriptions and dispatch queues, and the journal
+        self.own_outputs = outputs is None
+        self.outputs = outputs
+        if outputs is None:
+            self.outputs = Outputs(conf, frontends)
+
+        # Optionally, save the state now and then so that a restart can pick up
+        # where we left off
+        self.checkpoint = None
+        if conf.get("checkpoint-dir", "") != "":
+            self.checkpoint = Checkpoint(checkpoint_path(conf["checkpoint-dir"], conf),
+                                         interval=conf.get("checkpoint-interval", 60))
+
+        # The internal CTF snapshot, indexed by team and challenge id
+        self.state = State()
+
+        # Drops or repairs broken rows, and turns scores, places and points
+        # into numbers on the way in
+        self.validator = Validator(ctf)
+        self.normalizer = Normalizer(ctf)
+
+        # Once started, snapshots from the backend go into a queue and are
+        # applied in order by a single worker thread, so a backend may fetch
+        # things in parallel without racing on the state. Before that
+        # (and in the tests), handle_snapshot() applies them directly.
+        self.ingest = queue.Queue()
+        self.worker = None
+
+        # Held while the state is being changed, and by anyone reading it
+        self.lock = threading.RLock()
+
+        # Each team's score and place over time, up to a fixed number of
+        # points per team. Only kept if someone asks for it with history-points.
+        self.history = None
+        if conf.get("history-points", 0) > 0:
+            self.history = History(conf["history-points"])
+
+        # When the snapshot being applied arrived
+        self.now = time.time()
+
+        # Fingerprints of the last snapshot of each kind, and of each
+        # row in it by team/challenge id. Unchanged data is skipped.
+        self.fingerprints = { "scoreboard": None, "challenges": None }
+        self.row_fingerprints = { "scoreboard": {}, "challenges": {} }
+
+        # How many snapshots were diffed, and how many were skipped
+        # since they were identical to the one before
+        self.snapshot_stats = {
+            "scoreboard": { "processed": 0, "skipped": 0 },
+            "challenges": { "processed": 0, "skipped": 0 },
         }
 
         self.log.info("Middle-end initialized.")
 
     def start(self):
-        pass
+        if self.own_outputs:
+            self.outputs.start()
 
-    def stop(self):
-        pass
+        if self.checkpoint is not None:
+            with self.lock:
+                self._restore(self.checkpoint.load())
+
+        self.worker = threading.Thread(target=self._run)
+        self.worker.daemon = True
+        self.worker.start()
 
-    # A snapshot of some data from the backend
+    def stop(self):
+        # Everything the backend has sent so far is applied first
+        if self.worker is not None:
+            self.ingest.put(None)
+            self.worker.join()
+            self.worker = None
+
+        if self.checkpoint is not None and self.booted:
+            self.checkpoint.save(thaw(self.ctfstate), wait=True)
+
+        if self.own_outputs:
+            self.outputs.stop()
+
+    # The CTF state in the same format as the backend snapshots,
+    # with teams in scoreboard order.
+    @property
+    def ctfstate(self):
+        with self.lock:
+            return self.state.as_snapshot()
+
+    # Cheap scoreboard queries, for frontends and anyone else who wants them.
+    # The entries are frozen, so they can be handed out as they are.
+
+    # The first n team entries in scoreboard order
+    def top(self, n):
+        with self.lock:
+            return tuple(self.state.teams[tid] for tid in self.state.ranking.top(n))
+
+    # A team's position on the scoreboard, starting at 1, or None
+    def rank(self, team_id):
+        with self.lock:
+            return self.state.ranking.rank(team_id)
+
+    # Up to n team entries directly above and below a team, as (above, below)
+    def neighbours(self, team_id, n=1):
+        with self.lock:
+            above,below = self.state.ranking.neighbours(team_id, n)
+            return (tuple(self.state.teams[tid] for tid in above),
+                    tuple(self.state.teams[tid] for tid in below))
+
+    # A team's (time, score, place) points between two unix times,
+    # oldest first. Older points are more spread out.
+    def score_history(self, team_id, since=None, until=None):
+        if self.history is None:
+            return ()
+        with self.lock:
+            return self.history.points(team_id, since, until)
+
+    # How much a team's score has changed since some time, or None
+    def score_delta(self, team_id, since):
+        if self.history is None:
+            return None
+        with self.lock:
+            return self.history.delta(team_id, since)
+
+    # The n teams which gained the most points since some time,
+    # as a list of (team entry, delta)
+    def biggest_movers(self, since, n=10):
+        if self.history is None:
+            return []
+        with self.lock:
+            return [ (self.state.teams[tid], d) for tid,d in self.history.movers(since, n) ]
+
+    # A snapshot of some data from the backend.
+    # Safe to call from any thread. Snapshots are applied in the order
+    # they arrive.
     def handle_snapshot(self, snapshot):
         assert(type(snapshot) == tuple)
         assert(len(snapshot) == 2)
+
+        if self.worker is not None:
+            self.ingest.put(snapshot)
+            return
+
+        with self.lock:
+            self._apply_snapshot(snapshot)
+
+    # Waits until every snapshot handed to us so far has been applied
+    def flush(self):
+        if self.worker is not None:
+            self.ingest.join()
+
+    def _run(self):
+        while True:
+            snapshot = self.ingest.get()
+            try:
+                if snapshot is None:
+                    return
+
+                with self.lock:
+                    self._apply_snapshot(snapshot)
+            except Exception:
+                self.log.exception(f"Unable to apply {snapshot[0]} snapshot")
+            finally:
+                self.ingest.task_done()
+
+    def _apply_snapshot(self, snapshot):
         msg, in_data = snapshot
+        self.now = time.time()
 
         handlers = {
             "scoreboard" : self._handle_scoreboard,
-            "challenges" : self._handle_challenges
+            "challenges" : self._handle_challenges,
+
+            # Partial updates, from backends which know what changed
+            "scoreboard_patch" : self._handle_scoreboard_patch,
+            "challenges_patch" : self._handle_challenges_patch,
         }
 
         if msg not in handlers:
-            sys.stderr.write(f"ERROR: Unexpected message {msg} received from back-end")
+            self.log.error(f"Unexpected message {msg} received from back-end")
             return
 
+        if self.batch_events:
+            self.batch = []
+
         handlers[msg](in_data)
 
+        if self.batch is not None:
+            batch = self.batch
+            self.batch = None
+            if len(batch) > 0:
+                self._send_event( ("delta", MappingProxyType({ "events": tuple(batch) })) )
+
         # Special case: The very first scoreboard data
         # triggers a "boot" message to the frontend
         # containing everything we know.
@@ -62,18 +244,84 @@ class MiddleEnd:
             if msg == "scoreboard":
                 self._send_boot()
 
+        if self.checkpoint is not None and self.booted and self.checkpoint.due():
+            self.checkpoint.save(thaw(self.ctfstate))
+
+    # Start out with the state from a checkpoint, and boot the frontends
+    # with it right away. The first snapshot from the backend is then
+    # diffed against this, like any other.
+    def _restore(self, snapshot):
+        if snapshot is None:
+            return
+
+        for row in self._clean_rows("scoreboard", snapshot["scoreboard"]["scores"], True):
+            team = Team(row)
+            self.state.add_team(team)
+            self._record_history(None, team)
+
+        for row in self._clean_rows("challenges", snapshot["challenges"]["challenges"], True):
+            self.state.add_challenge(Challenge(row))
+
+        if len(self.state.teams) > 0:
+            self.log.info(f"Restored {len(self.state.teams)} teams from checkpoint.")
+            self._send_boot()
+
+    def _wants(self, msg):
+        return self.outputs.wants(msg)
+
     # Returns a team's existing entry on the scoreboard, or None if there is none
     def _find_team(self, team_id):
-        for t in self.ctfstate["scoreboard"]["scores"]:
-            if t["team_id"] == team_id: return t
-        return None
+        return self.state.team(team_id)
 
-    # Returns a team's existing entry on the scoreboard, or None if there is none
+    # Returns a challenge's existing entry, or None if there is none
     def _find_challenge(self, challenge_id):
-        for c in self.ctfstate["challenges"]["challenges"]:
-            if c["challenge_id"] == challenge_id: return c
-        return None
-
+        return self.state.challenge(challenge_id)
+
+    # The rows of a snapshot with numbers parsed and broken rows
+    # repaired or dropped, so the diffing can trust them
+    def _clean_rows(self, kind, rows, complete):
+        rows = self.normalizer.rows(kind, rows)
+        return self.validator.rows(kind, rows, complete)
+
+    # The same, along with the fingerprint of each clean row.
+    # raw_fps are the fingerprints of the rows as the backend sent them,
+    # which carry over to the clean rows made from them. Only the odd row
+    # which had to be repaired is fingerprinted again.
+    def _clean_rows_with_fingerprints(self, kind, rows, raw_fps):
+        normalized = self.normalizer.rows(kind, rows)
+        cleaned = self.validator.rows(kind, normalized, True)
+
+        if not isinstance(normalized, (list, tuple)):
+            return cleaned, []
+
+        fp_by_row = { id(row): fp for row,fp in zip(normalized, raw_fps) }
+
+        row_fps = []
+        for row in cleaned:
+            fp = fp_by_row.get(id(row))
+            row_fps.append(fingerprint(row) if fp is None else fp)
+        return cleaned, row_fps
+
+    # Returns the fingerprints of all the rows in a complete snapshot,
+    # as the backend sent them, or None if the snapshot is identical to
+    # the previous one. This comes before any cleaning of the rows,
+    # so a quiet poll costs no more than this.
+    def _fingerprint_snapshot(self, kind, rows):
+        if isinstance(rows, (list, tuple)):
+            row_fps = [ fingerprint(r) for r in rows ]
+            snapshot_fp = hash(tuple(row_fps))
+        else:
+            row_fps = []
+            snapshot_fp = fingerprint(rows)
+
+        # Quiet stretches of the CTF give the exact same data every poll
+        if snapshot_fp == self.fingerprints[kind]:
+            self.snapshot_stats[kind]["skipped"] += 1
+            return None
+
+        self.fingerprints[kind] = snapshot_fp
+        self.snapshot_stats[kind]["processed"] += 1
+        return row_fps
 
     def _compare_field(self, field, send_func, old_entry, new_entry, default_old=0):
         if field not in new_entry:
@@ -88,99 +336,244 @@ class MiddleEnd:
         send_func(old_entry, new_entry, old_value)
 
     def _handle_scoreboard(self, in_data):
+        rows = in_data.get("scores")
+        row_fps = self._fingerprint_snapshot("scoreboard", rows)
+        if row_fps is None:
+            return
+
+        self._update_scoreboard(*self._clean_rows_with_fingerprints("scoreboard", rows, row_fps))
+
+    # Only the teams in the patch are looked at. Everyone else stays as they were.
+    def _handle_scoreboard_patch(self, in_data):
+        rows = self._clean_rows("scoreboard", in_data.get("scores"), False)
+
+        # The state has moved on from the last full snapshot,
+        # so the next one has to be diffed even if it looks the same.
+        self.fingerprints["scoreboard"] = None
+
+        self._update_scoreboard(rows, [ fingerprint(r) for r in rows ])
+
+    def _update_scoreboard(self, rows, row_fps):
+        # Place changes are either sent one by one, or collected into
+        # team_id -> (old_place, place) and sent as a single reorder
+        moves = {}
+        def collect_place(old_entry, new_entry, old_value):
+            moves[new_entry["team_id"]] = (old_value, new_entry["place"])
+
+        send_place = self._send_team_place
+        if self.reorder_events:
+            send_place = collect_place
+        if not self._wants("reorder" if self.reorder_events else "place"):
+            send_place = lambda old_entry, new_entry, old_value: None
+
+        self._diff_teams(rows, row_fps, send_place)
+
+        if len(moves) > 0:
+            self._send_reorder(moves)
+
+        # The ranking is kept up to date as entries are stored,
+        # so there's no need to sort anything here.
+
+    def _diff_teams(self, rows, row_fps, send_place):
+        fingerprints = self.row_fingerprints["scoreboard"]
+
         # Diff against the old list and generate events
-        for new_entry in in_data["scores"]:
+        for new_entry,fp in zip(rows, row_fps):
             tid = new_entry["team_id"]
+
+            # This team's row is exactly like last time
+            if fingerprints.get(tid) == fp:
+                continue
+            fingerprints[tid] = fp
+
+            # The state only holds read-only records, so they can be handed
+            # to the frontends as they are.
+            new_entry = Team(new_entry)
+
+            # The state is updated before any events are sent,
+            # so a subscription's team filter sees the current data.
             old_entry = self._find_team(tid)
             if old_entry is None:
+                self.state.add_team(new_entry)
+                self._record_history(None, new_entry)
                 self._send_event( ("new_team", new_entry) )
-                self.ctfstate["scoreboard"]["scores"].append(new_entry)
                 continue
 
+            # Replace the old entry with the new data on top of it
+            self._update_entry(self.state.add_team, old_entry, new_entry)
+            self._record_history(old_entry, self._find_team(tid))
+
             self._compare_field("score", self._send_team_score,
                                          old_entry, new_entry,
                                          0)
 
-            self._compare_field("place", self._send_team_place,
+            self._compare_field("place", send_place,
                                          old_entry, new_entry,
                                          1000)
 
-            # Copy all the new data into the scoreboard
-            for k,v in new_entry.items():
-                old_entry[k] = v
+    def _handle_challenges(self, in_data):
+        rows = in_data.get("challenges")
+        row_fps = self._fingerprint_snapshot("challenges", rows)
+        if row_fps is None:
+            return
 
-        # We've updated all the team entries, but they are still in the old order.
-        self.ctfstate["scoreboard"]["scores"] = list(sorted(self.ctfstate["scoreboard"]["scores"], key=lambda x: x["place"]))
+        rows,row_fps = self._clean_rows_with_fingerprints("challenges", rows, row_fps)
+
+        fingerprints = self.row_fingerprints["challenges"]
 
-    def _handle_challenges(self, in_data):
         # Diff against the old list and generate events
-        for new_entry in in_data["challenges"]:
+        for new_entry,fp in zip(rows, row_fps):
             cid = new_entry["challenge_id"]
+
+            # This challenge's row is exactly like last time
+            if fingerprints.get(cid) == fp:
+                continue
+            fingerprints[cid] = fp
+
+            new_entry = Challenge(new_entry)
+
             old_entry = self._find_challenge(cid)
             if old_entry is None:
                 self._send_event( ("new_challenge", new_entry) )
-                self.ctfstate["challenges"]["challenges"].append(new_entry)
+                self.state.add_challenge(new_entry)
                 continue
 
-            self._compare_field("solves", self._send_challenge_solves,
-                                         old_entry, new_entry,
-                                         [])
-            for k,v in new_entry.items():
-                old_entry[k] = v
+            if "solves" in new_entry:
+                self._add_solves(cid, new_entry["solves"])
+
+            self._update_entry(self.state.add_challenge, old_entry, new_entry)
+
+    # Each row has a challenge_id and optionally "new_solves", a list of teams
+    # which solved it since the backend last said anything about it. Any other
+    # fields are updated like in a full snapshot.
+    def _handle_challenges_patch(self, in_data):
+        self.fingerprints["challenges"] = None
+
+        for row in self._clean_rows("challenges", in_data.get("challenges"), False):
+            cid = row["challenge_id"]
+            new_solves = row.get("new_solves", ())
+
+            # The next full row for this one has to be diffed again
+            self.row_fingerprints["challenges"].pop(cid, None)
+
+            new_entry = Challenge((k,v) for k,v in row.items() if k != "new_solves")
+
+            old_entry = self._find_challenge(cid)
+            if old_entry is None:
+                new_entry = new_entry.replace({ "solves": new_entry.get("solves", ()) + tuple(new_solves) })
+                self._send_event( ("new_challenge", new_entry) )
+                self.state.add_challenge(new_entry)
+                continue
+
+            if "solves" in new_entry:
+                self._add_solves(cid, new_entry["solves"])
+
+            added = self._add_solves(cid, new_solves)
+            if len(added) > 0:
+                new_entry = new_entry.replace({ "solves": old_entry.get("solves", ()) + tuple(added) })
+
+            self._update_entry(self.state.add_challenge, old_entry, new_entry)
+
+    # Adds a point to the team's history if its score or place changed
+    def _record_history(self, old_entry, entry):
+        if self.history is None:
+            return
+
+        score = entry.get("score")
+        place = entry.get("place")
+        if old_entry is not None:
+            if old_entry.get("score") == score and old_entry.get("place") == place:
+                return
 
-        # Keep them sorted by challenge id, for simplicity
-        self.ctfstate["challenges"]["challenges"] = list(sorted(self.ctfstate["challenges"]["challenges"], key=lambda x: x["challenge_id"]))
+        self.history.record(entry["team_id"], self.now, score, place)
+
+    # Records can't be updated in place. Build a merged one, but only
+    # if there's actually a difference. Otherwise the old one is still good.
+    def _update_entry(self, store_func, old_entry, new_entry):
+        for k,v in new_entry.items():
+            if k not in old_entry or old_entry[k] != v:
+                break
+        else:
+            return
 
-        pass
+        store_func(old_entry.replace(new_entry))
 
 
     def _send_boot(self):
+        snapshot = self.state.as_snapshot()
+
         payload = {}
-        payload["scoreboard"] = self.ctfstate["scoreboard"]
-        if len(self.ctfstate["challenges"]["challenges"]) > 0:
-            payload["challenges"] = self.ctfstate["challenges"]
+        payload["scoreboard"] = snapshot["scoreboard"]
+        if len(snapshot["challenges"]["challenges"]) > 0:
+            payload["challenges"] = snapshot["challenges"]
 
-        self._send_event( ("boot", payload) )
+        # The entries themselves are already frozen, so this
+        # only wraps the lists around them.
+        self._send_event( ("boot", freeze(payload)) )
 
     def _send_team_score(self, old_entry, new_entry, old_value):
+        if not self._wants("score"):
+            return
+
         self._send_event(
-            ( "score", {
+            ( "score", MappingProxyType({
                        "team_id": new_entry["team_id"],
                        "old_score": old_value,
                        "score": new_entry["score"]
-                       }
+                       })
             )
         )
 
     def _send_team_place(self, old_entry, new_entry, old_value):
         self._send_event(
-            ( "place", {
+            ( "place", MappingProxyType({
                        "team_id": new_entry["team_id"],
                        "old_place": old_value,
                        "place": new_entry["place"]
-                       }
+                       })
+            )
+        )
+
+    # One event for all the place changes in a scoreboard.
+    # moves is team_id -> (old_place, place), for only the teams which moved
+    def _send_reorder(self, moves):
+        self._send_event(
+            ( "reorder", MappingProxyType({
+                       "places": MappingProxyType({ tid: place for tid,(_,place) in moves.items() }),
+                       "old_places": MappingProxyType({ tid: old for tid,(old,_) in moves.items() })
+                       })
             )
         )
 
+    # Sends out solve events for the teams which weren't already known
+    # to have solved the challenge. Returns those teams.
+    def _add_solves(self, cid, solves):
+        known = self.state.solves[cid]
+        new_solvers = [ tid for tid in solves if tid not in known ]
+        if len(new_solvers) == 0:
+            return new_solvers
 
-    def _send_challenge_solves(self, old_entry, new_entry, old_value):
-        is_first = False
-        for tid in new_entry["solves"]:
-            if tid in old_value: continue
+        # Only the very first solver of a challenge gets the first blood
+        had_solves = len(known) > 0
+        known.update(dict.fromkeys(new_solvers))
 
-            is_first = (len(old_value) == 0) and not is_first
+        self._send_challenge_solves(cid, new_solvers, not had_solves)
+        return new_solvers
 
+    def _send_challenge_solves(self, cid, new_solvers, first_blood):
+        if not self._wants("solve"):
+            return
+
+        for i,tid in enumerate(new_solvers):
             self._send_event(
-                ( "solve", {
+                ( "solve", MappingProxyType({
                            "team_id": tid,
-                           "challenge_id": new_entry["challenge_id"],
-                           "first": is_first
-                           }
+                           "challenge_id": cid,
+                           "first": first_blood and i == 0
+                           })
                 )
             )
 
-
-
     # Drop events before boot event has been sent out
     # This way, the diffing code is kept free from
     # boot checks.
@@ -190,9 +583,15 @@ class MiddleEnd:
                 return
             self.booted = True
 
-        for front in self.frontends:
-            # Prevent accidental leaks of internal object references
-            front.handle_event(CP(event))
+        if not self._wants(event[0]):
+            return
+
+        # Hold on to it until the whole snapshot has been processed
+        if self.batch is not None:
+            self.batch.append(event)
+            return
+
+        self.outputs.deliver(event, self._find_team, self.ctf)
 
 
 
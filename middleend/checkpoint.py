@@ -0,0 +1,81 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# Periodic snapshots of the middle-end state on disk, so that a restarted
+# ctfront can show the last known scoreboard right away, and diff the first
+# live poll against it instead of starting from scratch.
+#
+# Each CTF gets its own file, named after a hash of the backend and URL.
+# Files are replaced atomically, so a crash mid-write leaves the previous
+# checkpoint intact.
+
+def checkpoint_path(directory, conf):
+    key = f"{conf.get('backend', '')} {conf.get('url', '')}"
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(os.path.expanduser(directory), f"{name}.json")
+
+class Checkpoint:
+    def __init__(self, path, interval=60):
+        self.path = path
+        self.interval = interval
+
+        self.log = logging.getLogger(__name__)
+
+        self.last_save = time.time()
+        self.writer = None
+
+    # Returns the stored snapshot, in the same format as MiddleEnd.ctfstate,
+    # or None if there is nothing (usable) on disk
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+
+            saved = time.ctime(data["time"])
+            state = data["state"]
+            if not isinstance(state["scoreboard"]["scores"], list) or \
+               not isinstance(state["challenges"]["challenges"], list):
+                raise ValueError("Not a snapshot")
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.log.warning(f"Ignoring unreadable checkpoint {self.path}")
+            return None
+
+        self.log.info(f"Loaded checkpoint from {saved}")
+        return state
+
+    def due(self):
+        return time.time() - self.last_save >= self.interval
+
+    # Write a snapshot (plain, JSON-able data) in the background.
+    # If the previous one is still being written, this one is skipped.
+    def save(self, state, wait=False):
+        if self.writer is not None and self.writer.is_alive():
+            if not wait:
+                return
+            self.writer.join()
+
+        self.last_save = time.time()
+        data = { "time": self.last_save, "state": state }
+
+        self.writer = threading.Thread(target=self._write, args=(data,))
+        self.writer.daemon = True
+        self.writer.start()
+
+        if wait:
+            self.writer.join()
+
+    def _write(self, data):
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp, self.path)
+        except Exception:
+            self.log.exception(f"Unable to write checkpoint {self.path}")
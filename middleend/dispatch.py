@@ -0,0 +1,216 @@
+import logging
+import threading
+
+from collections import deque
+from types import MappingProxyType
+
+from middleend.event import tag, untag
+
+# Delivers events to a single frontend from a thread of its own,
+# so that a slow frontend can't hold up the backend's polling.
+#
+# Events which are superseded by a newer one (a team's score or place,
+# the scoreboard order) are merged into the one already waiting in the
+# queue, so a frontend which falls behind only sees the latest values.
+#
+# Putting an event never waits for the frontend, since the middle-end holds
+# its locks while delivering, and one stuck frontend would stall everything.
+# When the queue is full, the oldest score, place and reorder events are
+# dropped to make room. Events which can't be made up for later
+# (new teams, solves, boots) are never dropped, and may take the queue past
+# its size if there's nothing else to drop.
+class Dispatcher:
+    def __init__(self, front, size):
+        self.front = front
+        self.size = size
+
+        self.log = logging.getLogger(__name__)
+
+        # Each entry is a list of [ event, batched, ctf, key ], where batched
+        # means that the event arrived as part of a "delta", ctf is the CTF
+        # it was tagged with (or None) and key its coalescing key (or None).
+        self.queue = deque()
+
+        # Coalescing key -> queue entry, for events which can be merged
+        self.index = {}
+
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        self.stats = {
+            "delivered": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "overflow": 0,
+        }
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Whatever is still queued is delivered before this returns
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def put(self, event):
+        with self.cond:
+            ctf,event = untag(event)
+            msg,data = event
+            if msg == "delta":
+                for ev in data["events"]:
+                    self._put_one(ev, True, ctf)
+            else:
+                self._put_one(event, False, ctf)
+
+            self.cond.notify_all()
+
+    def _put_one(self, event, batched, ctf):
+        self._barrier(event, ctf)
+
+        key = self._key(event)
+        if key is not None:
+            key = (ctf,) + key
+        if key is not None and key in self.index:
+            entry = self.index[key]
+            entry[0] = self._merge(entry[0], event)
+            self.stats["coalesced"] += 1
+            return
+
+        if len(self.queue) >= self.size:
+            self._make_room()
+
+        entry = [ event, batched, ctf, key ]
+        self.queue.append(entry)
+        if key is not None:
+            self.index[key] = entry
+
+    # Drops the oldest event which only carries a value that's out of date
+    # by now anyway. The frontend is simply behind on that one.
+    def _make_room(self):
+        for i,entry in enumerate(self.queue):
+            key = entry[3]
+            if key is not None:
+                del self.queue[i]
+                if self.index.get(key) is entry:
+                    del self.index[key]
+                self.stats["dropped"] += 1
+                return
+
+        self.stats["overflow"] += 1
+
+    # Events which may be merged with an older one of the same key,
+    # or None if the event must be delivered as it is.
+    def _key(self, event):
+        msg,data = event
+        if msg in [ "score", "place" ]:
+            return (msg, data["team_id"])
+        if msg == "reorder":
+            return (msg,)
+        return None
+
+    # A reorder merged into an older one would be delivered before a team
+    # which arrived in between, and the frontend would drop that team's move.
+    # So events which bring in teams start afresh: nothing queued before them
+    # (from the same CTF) takes in a reorder, or anything at all after a boot.
+    def _barrier(self, event, ctf):
+        msg,_ = event
+        if msg == "new_team":
+            self.index.pop((ctf, "reorder"), None)
+        elif msg == "boot":
+            for key in [ k for k in self.index if k[0] == ctf ]:
+                del self.index[key]
+
+    # Keep the old value from the first event and the new value from the last,
+    # so the frontend sees a single change covering both.
+    def _merge(self, old, new):
+        msg,old_data = old
+        _,new_data = new
+
+        if msg == "score":
+            return (msg, MappingProxyType({
+                            "team_id": new_data["team_id"],
+                            "old_score": old_data["old_score"],
+                            "score": new_data["score"]
+                        }))
+
+        if msg == "place":
+            return (msg, MappingProxyType({
+                            "team_id": new_data["team_id"],
+                            "old_place": old_data["old_place"],
+                            "place": new_data["place"]
+                        }))
+
+        if msg == "reorder":
+            places = dict(old_data["places"])
+            places.update(new_data["places"])
+
+            old_places = dict(new_data["old_places"])
+            old_places.update(old_data["old_places"])
+
+            return (msg, MappingProxyType({
+                            "places": MappingProxyType(places),
+                            "old_places": MappingProxyType(old_places)
+                        }))
+
+        return new
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while len(self.queue) == 0 and self.running:
+                    self.cond.wait()
+
+                # Stopped, and everything has been delivered
+                if len(self.queue) == 0:
+                    return
+
+                # Take everything. The frontend may as well catch up in one go.
+                entries = list(self.queue)
+                self.queue.clear()
+                self.index.clear()
+                self.cond.notify_all()
+
+            try:
+                self._deliver(entries)
+            except Exception:
+                self.log.exception("Frontend failed to handle an event.")
+
+    def _deliver(self, entries):
+        # Consecutive events which arrived batched (from the same CTF)
+        # are delivered as a single delta again, everything else one at a time.
+        batch = []
+        batch_ctf = None
+        for event,batched,ctf,_ in entries:
+            if batched and (len(batch) == 0 or ctf == batch_ctf):
+                batch.append(event)
+                batch_ctf = ctf
+                continue
+
+            self._flush(batch, batch_ctf)
+            batch = []
+
+            if batched:
+                batch.append(event)
+                batch_ctf = ctf
+                continue
+
+            self.front.handle_event(tag(ctf, event))
+            self.stats["delivered"] += 1
+
+        self._flush(batch, batch_ctf)
+
+    def _flush(self, batch, ctf):
+        if len(batch) == 0:
+            return
+
+        self.front.handle_event(tag(ctf, ("delta", MappingProxyType({ "events": tuple(batch) }))))
+        self.stats["delivered"] += 1
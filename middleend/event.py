@@ -0,0 +1,60 @@
+from collections.abc import Mapping, MutableMapping
+from types import MappingProxyType
+
+# Events are shared between all frontends (and the middle-end's own state),
+# so they are built from read-only structures instead of being deep-copied
+# for every frontend. Dicts become read-only mappings, lists become tuples.
+# A frontend which wants to scribble on the data must make its own copy.
+
+# Things which are already immutable all the way down
+_IMMUTABLE = (str, int, float, bool, bytes, type(None), frozenset)
+
+def freeze(obj):
+    if isinstance(obj, _IMMUTABLE):
+        return obj
+
+    # Read-only mappings (ours, anyway: frozen dicts and the team
+    # and challenge records) only ever contain frozen data,
+    # so there's no need to descend into them again.
+    if isinstance(obj, Mapping) and not isinstance(obj, MutableMapping):
+        return obj
+
+    if isinstance(obj, dict):
+        return MappingProxyType({ k: freeze(v) for k,v in obj.items() })
+
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+
+    if isinstance(obj, set):
+        return frozenset(obj)
+
+    return obj
+
+# The inverse of freeze(), giving a fully mutable deep copy
+def thaw(obj):
+    if isinstance(obj, Mapping):
+        return { k: thaw(v) for k,v in obj.items() }
+
+    if isinstance(obj, (list, tuple)):
+        return [ thaw(v) for v in obj ]
+
+    if isinstance(obj, frozenset):
+        return set(obj)
+
+    return obj
+
+# When the middle-end follows several CTFs at once, each event is wrapped
+# in a "ctf" event saying which CTF it belongs to:
+#   ( "ctf", { "ctf": "name", "event": ( msg, data ) } )
+def tag(ctf, event):
+    if ctf is None:
+        return event
+    return ("ctf", MappingProxyType({ "ctf": ctf, "event": event }))
+
+# The inverse of tag(). Returns (ctf, event), where ctf is None
+# for an event which wasn't tagged.
+def untag(event):
+    msg,data = event
+    if msg != "ctf":
+        return None, event
+    return data["ctf"], data["event"]
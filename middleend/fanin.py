@@ -0,0 +1,46 @@
+import logging
+
+from middleend.basic import MiddleEnd
+from middleend.output import Outputs
+
+# Follows several CTFs at once, for a single set of frontends.
+#
+# Each CTF has a MiddleEnd of its own, with its own state, which its backend
+# talks to just like it would to a lone middle-end. They all share the same
+# dispatch queues and journal, and their events reach the frontends tagged
+# with the name of the CTF (see middleend.event.tag).
+class FanIn:
+    def __init__(self, conf, frontends):
+        self.conf = conf
+
+        self.log = logging.getLogger(__name__)
+
+        try:
+            check = iter(frontends)
+        except:
+            frontends = [frontends]
+
+        self.frontends = frontends
+        self.outputs = Outputs(conf, frontends)
+
+        # CTF name -> MiddleEnd
+        self.middles = {}
+
+    # A middle-end for one more CTF, with its own (complete) configuration
+    def add(self, name, conf):
+        if name in self.middles:
+            raise ValueError(f"CTF {name} added twice")
+
+        middle = MiddleEnd(conf, self.frontends, ctf=name, outputs=self.outputs)
+        self.middles[name] = middle
+        return middle
+
+    def start(self):
+        self.outputs.start()
+        for middle in self.middles.values():
+            middle.start()
+
+    def stop(self):
+        for middle in self.middles.values():
+            middle.stop()
+        self.outputs.stop()
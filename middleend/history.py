@@ -0,0 +1,147 @@
+import bisect
+import heapq
+import math
+
+from array import array
+
+# Score and place over time, for each team.
+#
+# Every team gets up to a fixed number of points, stored in flat arrays
+# instead of a list of tuples. The arrays grow as points are added, so a
+# team which rarely changes costs next to nothing. When a team's arrays
+# reach the capacity, the oldest half of them is downsampled to every other
+# point, which makes room for more. Recent changes are kept in full detail
+# while the start of the CTF gets coarser and coarser, and the memory use
+# never grows past the capacity, however long the CTF goes on.
+#
+# Scores and places are step functions, so downsampling keeps the later
+# point of each pair: that's the value the team ended up with.
+# The very first point is always kept, so we know when a team showed up.
+
+# Stored for a place that isn't known
+NO_PLACE = 0
+
+# Scores are stored as doubles, which hold any integer score exactly,
+# and whole ones are handed back as ints, as the middle-end sends them.
+# Fractional scores stay floats, and a score that isn't known is NaN.
+def _score(value):
+    if value.is_integer():
+        return int(value)
+    return value
+
+class TeamHistory:
+    __slots__ = ( "capacity", "times", "scores", "places" )
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array("d")
+        self.scores = array("d")
+        self.places = array("l")
+
+    def add(self, time, score, place):
+        # Several changes at the same time are one point
+        if len(self.times) > 0 and self.times[-1] == time:
+            self.scores[-1] = score
+            self.places[-1] = place
+            return
+
+        if len(self.times) == self.capacity:
+            self._downsample()
+
+        self.times.append(time)
+        self.scores.append(score)
+        self.places.append(place)
+
+    def _downsample(self):
+        half = len(self.times) // 2
+        self.times = self.times[0:1] + self.times[2:half:2] + self.times[half:]
+        self.scores = self.scores[0:1] + self.scores[2:half:2] + self.scores[half:]
+        self.places = self.places[0:1] + self.places[2:half:2] + self.places[half:]
+
+    def _point(self, i):
+        place = self.places[i]
+        return (self.times[i], _score(self.scores[i]), None if place == NO_PLACE else place)
+
+    # The points in a time range, as (time, score, place)
+    def points(self, since=None, until=None):
+        start = 0
+        if since is not None:
+            start = bisect.bisect_left(self.times, since)
+
+        end = len(self.times)
+        if until is not None:
+            end = bisect.bisect_right(self.times, until)
+
+        return tuple(self._point(i) for i in range(start, end))
+
+    # The last point at or before a time, or None
+    def at(self, time):
+        i = bisect.bisect_right(self.times, time) - 1
+        if i < 0:
+            return None
+        return self._point(i)
+
+    def latest(self):
+        if len(self.times) == 0:
+            return None
+        return self._point(len(self.times) - 1)
+
+class History:
+    def __init__(self, capacity=128):
+        # Downsampling needs a little room to work with
+        self.capacity = max(capacity, 4)
+
+        # team_id -> TeamHistory
+        self.teams = {}
+
+    def record(self, team_id, time, score, place):
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            score = math.nan
+
+        try:
+            place = int(place)
+        except (TypeError, ValueError):
+            place = NO_PLACE
+
+        hist = self.teams.get(team_id)
+        if hist is None:
+            hist = TeamHistory(self.capacity)
+            self.teams[team_id] = hist
+
+        hist.add(time, score, place)
+
+    def points(self, team_id, since=None, until=None):
+        hist = self.teams.get(team_id)
+        if hist is None:
+            return ()
+        return hist.points(since, until)
+
+    # How much a team's score changed between two times (until defaults to now),
+    # or None if we know nothing about the team.
+    # A team we first heard of after since started out at 0.
+    def delta(self, team_id, since, until=None):
+        hist = self.teams.get(team_id)
+        if hist is None:
+            return None
+
+        end = hist.latest() if until is None else hist.at(until)
+        if end is None:
+            return None
+
+        start = hist.at(since)
+        if start is None:
+            return end[1]
+        return end[1] - start[1]
+
+    # The n teams whose score went up the most since some time,
+    # as a list of (team_id, delta), biggest first
+    def movers(self, since, n=10):
+        deltas = []
+        for tid in self.teams:
+            d = self.delta(tid, since)
+            if d is not None and not math.isnan(d):
+                deltas.append((tid, d))
+
+        return heapq.nlargest(n, deltas, key=lambda x: x[1])
@@ -0,0 +1,156 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import time
+import zlib
+
+from middleend.event import thaw
+
+# An append-only log of every event the middle-end sends out,
+# for post-CTF analysis or other tools which want the event stream.
+#
+# Each record is a 4-byte big-endian length followed by that many bytes of
+# JSON: { "time": unix timestamp, "event": [ msg, data ] }
+# JSON only has string keys, so a dict keyed by a numeric team_id
+# (like in the "reorder" event) comes back with string keys.
+#
+# The records go into gzip compressed segments named <path>.<n>.gz.
+# A new segment is started when the current one has taken max_bytes of
+# (uncompressed) records, and only the newest keep segments are kept around.
+#
+# All the encoding and disk access happens on a background thread,
+# so writing an event never makes the caller wait for the disk.
+
+HEADER = struct.Struct(">I")
+
+def _segments(path):
+    found = []
+    for name in glob.glob(glob.escape(path) + ".*.gz"):
+        m = re.match(re.escape(path) + r"\.([0-9]+)\.gz$", name)
+        if m is not None:
+            found.append((int(m[1]), name))
+    return [ name for n,name in sorted(found) ]
+
+# Returns every (timestamp, event) in the journal at path, oldest first
+def read_journal(path):
+    for name in _segments(path):
+        yield from _read_segment(name)
+
+# A segment which is still being written, or was cut off by a crash,
+# has no gzip trailer. Everything up to the last flush can still be read.
+def _read_segment(name):
+    with gzip.open(name, "rb") as f:
+        while True:
+            try:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    # The end, or a record cut off halfway
+                    return
+
+                length, = HEADER.unpack(header)
+                body = f.read(length)
+                if len(body) < length:
+                    return
+            except (EOFError, zlib.error, gzip.BadGzipFile):
+                return
+
+            record = json.loads(body)
+            yield record["time"], tuple(record["event"])
+
+class Journal:
+    def __init__(self, path, max_bytes=64*1024*1024, keep=10):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.keep = keep
+
+        self.log = logging.getLogger(__name__)
+
+        self.queue = queue.Queue()
+        self.thread = None
+
+        self.file = None
+        self.segment = 0
+        self.written = 0
+
+        self.stats = {
+            "records": 0,
+            "bytes": 0,
+        }
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+
+        # Never append to an old segment. Start a new one after it.
+        existing = _segments(self.path)
+        if len(existing) > 0:
+            self.segment = int(re.match(r".*\.([0-9]+)\.gz$", existing[-1])[1])
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.queue.put(None)
+        if self.thread is not None:
+            self.thread.join()
+
+    # Called from the middle-end. Just queues the event.
+    def write(self, event):
+        self.queue.put((time.time(), event))
+
+    def _run(self):
+        try:
+            self._rotate()
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+
+                self._write_record(*item)
+
+                # Flush whenever we run out of things to write,
+                # so a crash doesn't lose more than we have to.
+                if self.queue.empty():
+                    self.file.flush()
+        except Exception:
+            self.log.exception("Event journal failed. No more events will be written.")
+        finally:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write_record(self, timestamp, event):
+        msg,data = event
+        body = json.dumps({ "time": timestamp, "event": [ msg, thaw(data) ] }, default=str).encode("utf-8")
+
+        if self.written + len(body) > self.max_bytes and self.written > 0:
+            self._rotate()
+
+        self.file.write(HEADER.pack(len(body)))
+        self.file.write(body)
+
+        self.written += HEADER.size + len(body)
+        self.stats["records"] += 1
+        self.stats["bytes"] += HEADER.size + len(body)
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+
+        self.segment += 1
+        self.written = 0
+        self.file = gzip.open(f"{self.path}.{self.segment}.gz", "wb")
+
+        for name in _segments(self.path)[:-self.keep]:
+            try:
+                os.remove(name)
+            except OSError:
+                self.log.warning(f"Unable to remove old journal segment {name}")
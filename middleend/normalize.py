@@ -0,0 +1,105 @@
+import logging
+import re
+
+from collections.abc import Mapping
+
+# Backends which scrape HTML hand us scores like "1,337" or "1 337",
+# while those with an API give us ints. Everything numeric is turned into
+# ints (or floats, for the odd fractional score) once, on the way in,
+# so the rest of the middle-end and the frontends can compare and sort them.
+
+# An optional sign, digits with optional thousands separators,
+# and an optional fraction
+_NUMBER = re.compile(r"\s*([+-]?)((?:\d{1,3}(?:[,_' \u00a0\u202f]\d{3})+)|\d+)(?:\.(\d*))?\s*$")
+_SEPARATORS = re.compile(r"[,_' \u00a0\u202f]")
+
+# Returns the number, or None if value doesn't look like one
+def parse_number(value):
+    t = type(value)
+    if t == int:
+        return value
+
+    if t == float:
+        if value.is_integer():
+            return int(value)
+        return value
+
+    if t != str:
+        return None
+
+    m = _NUMBER.match(value)
+    if m is None:
+        return None
+
+    sign,digits,fraction = m.groups()
+    digits = _SEPARATORS.sub("", digits)
+
+    if fraction is not None and fraction.strip("0") != "":
+        return float(sign + digits + "." + fraction)
+    return int(sign + digits)
+
+class Normalizer:
+    # The numeric fields of each kind of snapshot row
+    FIELDS = {
+        "scoreboard": ( "score", "place" ),
+        "challenges": ( "points", ),
+    }
+
+    def __init__(self, ctf=None):
+        self.ctf = ctf
+
+        self.log = logging.getLogger(__name__)
+
+        # Fields we've already complained about
+        self.warned = set()
+
+    # Returns the rows with the numeric fields converted.
+    # Rows which are fine as they are aren't copied.
+    # A field which can't be parsed is left out, meaning "unknown".
+    def rows(self, kind, rows):
+        fields = self.FIELDS[kind]
+
+        # Broken listings and rows are left for the validator to deal with
+        if not isinstance(rows, (list, tuple)):
+            return rows
+
+        ret = None
+        for i,row in enumerate(rows):
+            if not isinstance(row, Mapping):
+                continue
+
+            fixed = None
+            for field in fields:
+                if field not in row:
+                    continue
+
+                value = row[field]
+                if type(value) == int:
+                    continue
+
+                if fixed is None:
+                    fixed = dict(row)
+
+                number = parse_number(value)
+                if number is None:
+                    self._warn(kind, field, value)
+                    del fixed[field]
+                else:
+                    fixed[field] = number
+
+            if fixed is not None:
+                if ret is None:
+                    ret = list(rows)
+                ret[i] = fixed
+
+        if ret is None:
+            return rows
+        return ret
+
+    def _warn(self, kind, field, value):
+        if (kind,field) in self.warned:
+            return
+        self.warned.add((kind,field))
+
+        source = "the backend" if self.ctf is None else self.ctf
+        self.log.warning(f"Ignoring malformed {field} {value!r} from {source}. Similar values won't be reported again.")
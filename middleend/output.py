@@ -0,0 +1,89 @@
+import threading
+
+from middleend.dispatch import Dispatcher
+from middleend.event import tag
+from middleend.journal import Journal
+from middleend.subscription import subscription_of
+
+# Everything between the middle-end and the frontends:
+# the frontends' subscriptions, their dispatch queues and the event journal.
+#
+# A middle-end normally has one of these to itself. When following several
+# CTFs, all the middle-ends share one, so the frontends get a single stream
+# of events (tagged with the CTF they came from).
+class Outputs:
+    def __init__(self, conf, frontends):
+        self.frontends = frontends
+
+        # Optionally, each frontend gets a queue and a thread of its own,
+        # so that a slow frontend doesn't hold up the backend.
+        self.dispatchers = []
+        queue_size = conf.get("dispatch-queue", 0)
+        if queue_size > 0:
+            self.dispatchers = [ Dispatcher(front, queue_size) for front in self.frontends ]
+
+        # Where each frontend's events go, and which of them it wants
+        self.targets = [ front.handle_event for front in self.frontends ]
+        if len(self.dispatchers) > 0:
+            self.targets = [ d.put for d in self.dispatchers ]
+        self.subscriptions = [ subscription_of(front) for front in self.frontends ]
+
+        # Optionally, keep a log of every event on disk
+        self.journal = None
+        if conf.get("journal", "") != "":
+            self.journal = Journal(conf["journal"],
+                                   max_bytes=conf.get("journal-max-bytes", 64*1024*1024),
+                                   keep=conf.get("journal-keep", 10))
+
+        # The event types anyone at all wants, or None for all of them.
+        # Events nobody wants aren't even built.
+        self.wanted = set()
+        for sub in self.subscriptions:
+            if sub is None or sub.events is None:
+                self.wanted = None
+                break
+            self.wanted |= sub.events
+        if self.journal is not None:
+            self.wanted = None
+
+        # Several middle-ends may deliver at once. Keep their events
+        # from getting interleaved on the way to the frontends.
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.journal is not None:
+            self.journal.start()
+
+        for d in self.dispatchers:
+            d.start()
+
+    def stop(self):
+        for d in self.dispatchers:
+            d.stop()
+
+        if self.journal is not None:
+            self.journal.stop()
+
+    def wants(self, msg):
+        return self.wanted is None or msg in self.wanted
+
+    # Send an event to everyone who wants it.
+    # find_team looks up a team in the CTF the event came from.
+    def deliver(self, event, find_team, ctf=None):
+        tagged = tag(ctf, event)
+
+        with self.lock:
+            if self.journal is not None:
+                self.journal.write(tagged)
+
+            # Every event is built from frozen data, so all the frontends
+            # can share the very same object without leaking anything
+            # they could modify.
+            for target,sub in zip(self.targets, self.subscriptions):
+                if sub is None:
+                    target(tagged)
+                    continue
+
+                filtered = sub.filter(event, find_team)
+                if filtered is not None:
+                    target(tag(ctf, filtered))
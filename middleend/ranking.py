@@ -0,0 +1,108 @@
+import bisect
+
+from operator import itemgetter
+
+# The scoreboard order, kept up to date as places change.
+#
+# Moves are only noted down as they come in, and the sorted lists are
+# brought up to date the next time someone reads them. A handful of moves
+# are then put in place one by one, while a poll which shook up a big part
+# of the board is cheaper to sort from scratch: every single move costs a
+# few list inserts and deletes, which are linear in the number of teams.
+#
+# Teams sharing a place are kept in the order they got there.
+class Ranking:
+    def __init__(self):
+        # Sorted list of (place, sequence number), and the team_id
+        # at the same index in a parallel list
+        self.keys = []
+        self.ids = []
+
+        # team_id -> its current key
+        self.key_by_id = {}
+
+        # Teams which moved since the lists were last brought up to date,
+        # team_id -> its key in the lists (None if it isn't in there)
+        self.pending = {}
+
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.key_by_id)
+
+    def __iter__(self):
+        self.settle()
+        return iter(self.ids)
+
+    def __contains__(self, team_id):
+        return team_id in self.key_by_id
+
+    # Put a team at the given place, or move it there
+    def update(self, team_id, place):
+        key = self.key_by_id.get(team_id)
+        if key is not None and key[0] == place:
+            return
+
+        self._moved(team_id, key)
+
+        self.seq += 1
+        self.key_by_id[team_id] = (place, self.seq)
+
+    def remove(self, team_id):
+        key = self.key_by_id.pop(team_id, None)
+        if key is not None:
+            self._moved(team_id, key)
+
+    def _moved(self, team_id, key):
+        # Only the first move counts, that's where the team is in the lists
+        if team_id not in self.pending:
+            self.pending[team_id] = key
+
+    # Brings the sorted lists up to date. Every read does this first.
+    def settle(self):
+        if len(self.pending) == 0:
+            return
+
+        if len(self.pending) > max(64, len(self.key_by_id) // 256):
+            items = sorted(self.key_by_id.items(), key=itemgetter(1))
+            self.keys = [ key for _,key in items ]
+            self.ids = [ tid for tid,_ in items ]
+        else:
+            for tid,old_key in self.pending.items():
+                if old_key is not None:
+                    i = bisect.bisect_left(self.keys, old_key)
+                    del self.keys[i]
+                    del self.ids[i]
+
+                key = self.key_by_id.get(tid)
+                if key is not None:
+                    i = bisect.bisect(self.keys, key)
+                    self.keys.insert(i, key)
+                    self.ids.insert(i, tid)
+
+        self.pending.clear()
+
+    # The team_ids of the first n teams
+    def top(self, n):
+        self.settle()
+        return self.ids[:n]
+
+    # The position of a team in the ranking, starting at 1,
+    # or None if it isn't ranked.
+    def rank(self, team_id):
+        key = self.key_by_id.get(team_id)
+        if key is None:
+            return None
+
+        self.settle()
+        return bisect.bisect_left(self.keys, key) + 1
+
+    # The team_ids of up to n teams directly above and below a team,
+    # as a tuple of (above, below)
+    def neighbours(self, team_id, n=1):
+        r = self.rank(team_id)
+        if r is None:
+            return [], []
+
+        i = r - 1
+        return self.ids[max(0, i - n):i], self.ids[i + 1:i + 1 + n]
@@ -0,0 +1,123 @@
+import sys
+
+from collections.abc import Mapping
+
+from middleend.event import freeze
+
+# Compact, read-only records for teams and challenges.
+#
+# These replace a dict per team and challenge, which costs a lot more memory
+# than a handful of slots. They still behave like a read-only dict, so the
+# frontends can keep using team["name"], "score" in team, dict(team) and so on.
+# Fields the backend didn't provide are simply not in the mapping.
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+MISSING = _Missing()
+
+# The same team and challenge ids show up over and over (every team
+# in every solve list), so make sure they all share a single string.
+def intern_id(value):
+    if type(value) == str:
+        return sys.intern(value)
+    return value
+
+class Record(Mapping):
+    __slots__ = ( "extra", )
+
+    # Set by each record type. The known fields get a slot each,
+    # anything else ends up in the "extra" dict.
+    FIELDS = ()
+
+    def __init__(self, row=()):
+        for f in self.FIELDS:
+            object.__setattr__(self, f, MISSING)
+        object.__setattr__(self, "extra", None)
+
+        items = row.items() if isinstance(row, Mapping) else row
+        for k,v in items:
+            self._set(k, v)
+
+    def _set(self, key, value):
+        if key in self.FIELDS:
+            object.__setattr__(self, key, self._convert(key, value))
+        else:
+            if self.extra is None:
+                object.__setattr__(self, "extra", {})
+            self.extra[key] = freeze(value)
+
+    # Records are shared between the state, every frontend and the
+    # checkpoints, so they can't be changed once they're built.
+    # replace() makes a new one instead.
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    # Record types can tweak the values they store
+    def _convert(self, key, value):
+        return value
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is MISSING:
+                raise KeyError(key)
+            return value
+
+        if self.extra is not None:
+            return self.extra[key]
+
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key) is not MISSING
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self):
+        for f in self.FIELDS:
+            if getattr(self, f) is not MISSING:
+                yield f
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)})"
+
+    # A new record with the fields of another mapping on top of this one
+    def replace(self, other):
+        ret = type(self)(self)
+        for k,v in other.items():
+            ret._set(k, v)
+        return ret
+
+class Team(Record):
+    __slots__ = ( "team_id", "name", "score", "place" )
+    FIELDS = __slots__
+
+    def _convert(self, key, value):
+        if key == "team_id":
+            return intern_id(value)
+        return value
+
+class Challenge(Record):
+    __slots__ = ( "challenge_id", "name", "points", "categories", "solves" )
+    FIELDS = __slots__
+
+    def _convert(self, key, value):
+        if key == "challenge_id":
+            return intern_id(value)
+        if key == "solves":
+            return tuple(intern_id(tid) for tid in value)
+        if key == "categories":
+            return tuple(value)
+        return value
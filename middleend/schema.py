@@ -0,0 +1,182 @@
+import logging
+
+from collections.abc import Mapping
+
+# Checks the rows of the backend snapshots before the middle-end diffs them,
+# so that a half-broken scrape drops or repairs a few rows instead of
+# taking down the whole update.
+#
+# Each schema is compiled once into a plain python function which checks a
+# row with a single expression, so the rows which are fine (nearly all of
+# them) cost next to nothing. Only rows which fail that get a closer look.
+
+_IDS = (str, int)
+
+# Numeric strings have already been parsed by the time we get here
+_NUMBERS = (int, float)
+
+_LISTS = (list, tuple)
+
+SCHEMAS = {
+    "scoreboard": {
+        "id": "team_id",
+
+        # field -> (allowed types, type of list items or None)
+        "fields": {
+            "name":  ((str,), None),
+            "score": (_NUMBERS, None),
+            "place": (_NUMBERS, None),
+        },
+
+        # Fields every row of a complete listing must have
+        "required": ( "place", ),
+    },
+
+    "challenges": {
+        "id": "challenge_id",
+
+        "fields": {
+            "name":       ((str,), None),
+            "points":     (_NUMBERS, None),
+            "categories": (_LISTS, (str,)),
+            "solves":     (_LISTS, _IDS),
+            "new_solves": (_LISTS, _IDS),
+        },
+
+        "required": (),
+    },
+}
+
+class _Absent:
+    __slots__ = ()
+
+_ABSENT = _Absent()
+
+# Builds the source of a function check(row) which is True if the row is
+# fine just as it is, and compiles it.
+def compile_schema(schema, complete):
+    names = {
+        "ABSENT": _ABSENT,
+        "IDS": frozenset(_IDS),
+    }
+
+    terms = [
+        "type(row) is dict",
+        f"type(row.get({schema['id']!r})) in IDS",
+    ]
+
+    for i,(field,(types,items)) in enumerate(schema["fields"].items()):
+        allowed = set(types)
+        if not (complete and field in schema["required"]):
+            allowed.add(_Absent)
+        names[f"T{i}"] = frozenset(allowed)
+
+        term = f"type(row.get({field!r}, ABSENT)) in T{i}"
+        if items is not None:
+            names[f"I{i}"] = frozenset(items)
+            term = f"({term} and all(type(x) in I{i} for x in row.get({field!r}, ())))"
+        terms.append(term)
+
+    source = "def check(row):\n    return " + " and \\\n           ".join(terms) + "\n"
+    exec(source, names)
+    return names["check"]
+
+class Validator:
+    def __init__(self, ctf=None):
+        self.ctf = ctf
+
+        self.log = logging.getLogger(__name__)
+
+        # (kind, complete) -> check function
+        self.checks = {}
+        for kind,schema in SCHEMAS.items():
+            for complete in [ True, False ]:
+                self.checks[(kind, complete)] = compile_schema(schema, complete)
+
+        # How many rows were checked, repaired and dropped, for each kind
+        self.stats = { kind: { "rows": 0, "repaired": 0, "dropped": 0 } for kind in SCHEMAS }
+
+        # Problems we've already complained about
+        self.warned = set()
+
+    # Returns the rows which are usable, repaired where possible.
+    # Rows which are fine as they are aren't copied.
+    # complete is True if the rows are a full listing, in order.
+    def rows(self, kind, rows, complete):
+        stats = self.stats[kind]
+
+        if not isinstance(rows, (list, tuple)):
+            self._warn(kind, f"a listing which isn't a list ({type(rows).__name__})")
+            return []
+
+        stats["rows"] += len(rows)
+
+        check = self.checks[(kind, complete)]
+        bad = [ i for i,row in enumerate(rows) if not check(row) ]
+        if len(bad) == 0:
+            return rows
+
+        ret = list(rows)
+        for i in bad:
+            ret[i] = self._repair(kind, rows[i], i, complete)
+            if ret[i] is None:
+                stats["dropped"] += 1
+            else:
+                stats["repaired"] += 1
+
+        return [ row for row in ret if row is not None ]
+
+    # A fixed copy of the row, or None if it's beyond saving
+    def _repair(self, kind, row, index, complete):
+        schema = SCHEMAS[kind]
+
+        if not isinstance(row, Mapping):
+            self._warn(kind, f"a row which isn't a dict ({type(row).__name__})")
+            return None
+
+        id_field = schema["id"]
+        if type(row.get(id_field)) not in _IDS:
+            self._warn(kind, f"a row without a usable {id_field}")
+            return None
+
+        row = dict(row)
+        for field,(types,items) in schema["fields"].items():
+            if field not in row:
+                continue
+
+            value = row[field]
+            if type(value) not in types:
+                # Something like a numeric team name can be saved
+                if types == (str,) and type(value) in (int, float):
+                    row[field] = str(value)
+                    continue
+
+                self._warn(kind, f"a {field} of type {type(value).__name__}")
+                del row[field]
+                continue
+
+            if items is not None:
+                kept = [ x for x in value if type(x) in items ]
+                if len(kept) != len(value):
+                    self._warn(kind, f"unusable entries in {field}")
+                    row[field] = kept
+
+        if complete:
+            for field in schema["required"]:
+                if field in row:
+                    continue
+
+                # The only required field is the place,
+                # and a complete scoreboard is listed in order.
+                self._warn(kind, f"a row without a {field}")
+                row[field] = index + 1
+
+        return row
+
+    def _warn(self, kind, problem):
+        if (kind,problem) in self.warned:
+            return
+        self.warned.add((kind,problem))
+
+        source = "the backend" if self.ctf is None else self.ctf
+        self.log.warning(f"Bad {kind} data from {source}: {problem}. Similar rows won't be reported again.")
@@ -0,0 +1,68 @@
+import bisect
+
+from middleend.ranking import Ranking
+
+# The middle-end's running copy of a CTF.
+# Teams and challenges are kept in dicts keyed by their IDs, so that
+# diffing a snapshot costs one lookup per row instead of a scan of the
+# whole board. The ordered lists that the frontends expect
+# are derived from these when they are needed.
+class State:
+    def __init__(self):
+        # team_id -> team entry
+        self.teams = {}
+
+        # Teams in scoreboard order, updated as places change
+        self.ranking = Ranking()
+
+        # challenge_id -> challenge entry
+        self.challenges = {}
+
+        # challenge_id -> every team_id which solved it, as the keys of a dict.
+        # That's a set which remembers the order of solves.
+        self.solves = {}
+
+        # All challenge ids, kept sorted
+        self.challenge_order = []
+
+    # Returns a team's existing entry, or None if there is none
+    def team(self, team_id):
+        return self.teams.get(team_id)
+
+    # Returns a challenge's existing entry, or None if there is none
+    def challenge(self, challenge_id):
+        return self.challenges.get(challenge_id)
+
+    def add_team(self, entry):
+        tid = entry["team_id"]
+        self.teams[tid] = entry
+        if "place" in entry:
+            self.ranking.update(tid, entry["place"])
+
+    def add_challenge(self, entry):
+        cid = entry["challenge_id"]
+        if cid not in self.challenges:
+            bisect.insort(self.challenge_order, cid)
+        self.challenges[cid] = entry
+        if cid not in self.solves:
+            self.solves[cid] = dict.fromkeys(entry.get("solves", ()))
+
+    # All teams, in scoreboard order
+    def scores(self):
+        return [ self.teams[tid] for tid in self.ranking ]
+
+    # All challenges, sorted by challenge id for simplicity
+    def challenge_list(self):
+        return [ self.challenges[cid] for cid in self.challenge_order ]
+
+    # The same format as the snapshots from the backend
+    def as_snapshot(self):
+        return {
+            "scoreboard": {
+                "scores": self.scores()
+            },
+
+            "challenges": {
+                "challenges": self.challenge_list()
+            }
+        }
@@ -0,0 +1,136 @@
+from types import MappingProxyType
+
+# The events a frontend is interested in.
+#
+# A frontend may have a subscription() method returning one of these.
+# Frontends without one get every event, just like before.
+#
+#   events: the event types to deliver, or None for all of them.
+#           "boot" and "delta" always get through.
+#   top:    only team events for teams placed in the top N
+#   teams:  only team events for teams where teams(team) is True
+#
+# If both top and teams are given, a team only has to satisfy one of them.
+# That's a scoreboard of the top N, plus some focused teams further down.
+#
+# A team which moves into view gets a "new_team" event with its current
+# data (since the frontend didn't hear about it while it was out of view),
+# together with the place change in a "delta".
+# A team which moves out of view gets its last place change.
+# The boot event is always complete.
+class Subscription:
+    def __init__(self, events=None, top=None, teams=None):
+        self.events = None
+        if events is not None:
+            self.events = frozenset(events) | { "boot", "delta" }
+
+        self.top = top
+        self.teams = teams
+
+    def wants(self, msg):
+        return self.events is None or msg in self.events
+
+    def filters_teams(self):
+        return self.top is not None or self.teams is not None
+
+    # Whether a team at some place is in view
+    def shows(self, team, place):
+        if not self.filters_teams():
+            return True
+
+        if self.top is not None and place is not None and place <= self.top:
+            return True
+
+        if self.teams is not None and team is not None and self.teams(team):
+            return True
+
+        return False
+
+    # Returns the event as it should be delivered, or None.
+    # find_team looks up a team's current entry in the middle-end.
+    def filter(self, event, find_team):
+        msg,data = event
+
+        if msg == "delta":
+            events = []
+            changed = False
+            for ev in data["events"]:
+                filtered = self.filter(ev, find_team)
+                if filtered is not ev:
+                    changed = True
+
+                if filtered is None:
+                    continue
+                if filtered[0] == "delta":
+                    events.extend(filtered[1]["events"])
+                else:
+                    events.append(filtered)
+
+            if len(events) == 0:
+                return None
+            if not changed:
+                return event
+            return ("delta", MappingProxyType({ "events": tuple(events) }))
+
+        if not self.wants(msg):
+            return None
+
+        if not self.filters_teams():
+            return event
+
+        if msg in [ "new_team", "score", "solve" ]:
+            team = find_team(data["team_id"])
+            if team is None or self.shows(team, team.get("place")):
+                return event
+            return None
+
+        if msg == "place":
+            team = find_team(data["team_id"])
+            if self.shows(team, data["old_place"]):
+                return event
+            if self.shows(team, data["place"]):
+                return self._enter([ team ], event)
+            return None
+
+        if msg == "reorder":
+            places = {}
+            old_places = {}
+            for tid,place in data["places"].items():
+                team = find_team(tid)
+                if self.shows(team, data["old_places"][tid]) or self.shows(team, place):
+                    places[tid] = place
+                    old_places[tid] = data["old_places"][tid]
+
+            if len(places) == 0:
+                return None
+
+            # Teams coming into view are in the reorder as well,
+            # so the frontend sees where they came from.
+            entering = [ find_team(tid) for tid in places
+                         if not self.shows(find_team(tid), old_places[tid]) ]
+
+            reorder = event
+            if len(places) < len(data["places"]):
+                reorder = ("reorder", MappingProxyType({
+                                "places": MappingProxyType(places),
+                                "old_places": MappingProxyType(old_places)
+                            }))
+
+            return self._enter(entering, reorder)
+
+        return event
+
+    # The teams which came into view, followed by the event which moved them
+    def _enter(self, teams, event):
+        if len(teams) == 0 or not self.wants("new_team"):
+            return event
+
+        events = tuple(("new_team", team) for team in teams) + (event,)
+        return ("delta", MappingProxyType({ "events": events }))
+
+# The subscription of a frontend, or None if it wants everything
+def subscription_of(front):
+    func = getattr(front, "subscription", None)
+    if func is None:
+        return None
+    return func()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from copy import deepcopy as CP
+
+from middleend.basic import MiddleEnd
+from middleend.checkpoint import checkpoint_path
+from middleend.event import thaw
+
+from tests.test_middleend import LogFrontEnd, dummy_team_1, dummy_team_2, dummy_team_3, dummy_chall_1
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def conf(self, url="https://ctf.example.com"):
+        return { "checkpoint-dir": self.tmp.name, "backend": "ctfd", "url": url }
+
+    def test_restart(self):
+        front = LogFrontEnd()
+        mid = MiddleEnd(self.conf(), front)
+        mid.start()
+
+        # Nothing to restore the first time around
+        self.assertEqual(front.log, [])
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+        mid.stop()
+
+        # After a restart, the frontend is booted from the checkpoint
+        # before the backend has said anything
+        front = LogFrontEnd()
+        mid = MiddleEnd(self.conf(), front)
+        mid.start()
+
+        self.assertEqual(len(front.log), 1)
+        msg,data = front.log[0]
+        self.assertEqual(msg, "boot")
+        self.assertEqual(thaw(data["scoreboard"]), { "scores": [ dummy_team_2, dummy_team_1 ] })
+        self.assertEqual(thaw(data["challenges"]), { "challenges": [ dummy_chall_1 ] })
+
+        # The first live poll is a diff, not a new boot
+        front.log = []
+        t_1 = CP(dummy_team_1)
+        t_1["score"] = 99
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_1, dummy_team_3 ] })))
+        mid.flush()
+
+        front.sort_events()
+        self.assertEqual([ m for m,_ in front.log ], [ "new_team", "score" ])
+
+    # Checkpoints for other CTFs don't get mixed up
+    def test_other_ctf(self):
+        mid = MiddleEnd(self.conf(), LogFrontEnd())
+        mid.start()
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+        mid.stop()
+
+        front = LogFrontEnd()
+        mid = MiddleEnd(self.conf(url="https://other.example.com"), front)
+        mid.start()
+        self.assertEqual(front.log, [])
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+    # A checkpoint which isn't one is ignored, not a crash at startup
+    def test_broken(self):
+        path = checkpoint_path(self.tmp.name, self.conf())
+        for content in [ "{}", '{ "time": 1 }', '{ "time": 1, "state": {} }', "[ 1, 2 ]", "not json" ]:
+            with open(path, "w") as f:
+                f.write(content)
+
+            front = LogFrontEnd()
+            mid = MiddleEnd(self.conf(), front)
+            mid.start()
+            mid.stop()
+            self.assertEqual(front.log, [])
@@ -0,0 +1,216 @@
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import requests
+    from backend import client
+except ImportError:
+    requests = None
+
+# A tiny CTF server on localhost, which serves whatever the test tells it to
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+
+        status, headers, body = server.respond(self)
+        self.send_response(status)
+        for k,v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class Server(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.requests = []
+        self.respond = lambda handler: (200, {}, b"hello")
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+@unittest.skipUnless(requests is not None, "requests isn't installed")
+class TestClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_get(self):
+        c = client.Client({ "read-timeout": 2 })
+        resp = c.get(self.server.url + "/scoreboard")
+        self.assertEqual(resp.text, "hello")
+
+        # Compression is asked for
+        self.assertIn("gzip", self.server.requests[0]["Accept-Encoding"])
+
+        # And timed
+        host = self.server.url[len("http://"):]
+        self.assertEqual(client.stats()[host]["requests"], 1)
+
+    def test_conditional(self):
+        def etag(handler):
+            if handler.headers.get("If-None-Match") == '"v1"':
+                return (304, {}, b"")
+            return (200, { "ETag": '"v1"' }, b"scoreboard")
+        self.server.respond = etag
+
+        c = client.Client()
+        url = self.server.url + "/scoreboard"
+
+        self.assertEqual(c.get(url, conditional=True).status_code, 200)
+        self.assertTrue(client.unchanged(c.get(url, conditional=True)))
+
+        # Only conditional requests are conditional
+        self.assertEqual(c.get(url).status_code, 200)
+        self.assertNotIn("If-None-Match", self.server.requests[-1])
+
+        host = self.server.url[len("http://"):]
+        self.assertEqual(client.stats()[host]["not_modified"], 1)
+
+    def test_same_body(self):
+        bodies = [ b"first", b"first", b"second", b"second" ]
+        self.server.respond = lambda handler: (200, {}, bodies.pop(0))
+
+        c = client.Client()
+        url = self.server.url + "/scoreboard"
+
+        seen = [ client.unchanged(c.get(url, conditional=True)) for _ in range(4) ]
+        self.assertEqual(seen, [ False, True, False, True ])
+
+        host = self.server.url[len("http://"):]
+        self.assertEqual(client.stats()[host]["same_body"], 2)
+        self.assertEqual(client.stats()[host]["skip_rate"], 0.5)
+
+    def test_retry(self):
+        answers = [ 503, 502, 200 ]
+        self.server.respond = lambda handler: (answers.pop(0), {}, b"hello")
+
+        c = client.Client({ "retry-backoff": 0.01 })
+        resp = c.get(self.server.url + "/scoreboard")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+        host = self.server.url[len("http://"):]
+        self.assertEqual(client.stats()[host]["retries"], 2)
+        self.assertEqual(client.stats()[host]["breaker"], "closed")
+
+    def test_circuit_open(self):
+        self.server.respond = lambda handler: (500, {}, b"oh no")
+
+        c = client.Client({ "http-retries": 0, "breaker-threshold": 3, "breaker-cooldown": 60 })
+        url = self.server.url + "/scoreboard"
+        for _ in range(3):
+            self.assertEqual(c.get(url).status_code, 500)
+
+        # The server is left alone now
+        with self.assertRaises(client.CircuitOpen):
+            c.get(url)
+        self.assertEqual(len(self.server.requests), 3)
+
+        # Which is a connection error, as far as backends are concerned
+        with self.assertRaises(requests.exceptions.RequestException):
+            c.get(url)
+
+    def test_rate_limit(self):
+        c = client.Client({ "rate-limit": 10, "rate-burst": 2 })
+        url = self.server.url + "/scoreboard"
+
+        # Two go straight out, the rest wait their turn, across threads
+        threads = [ threading.Thread(target=c.get, args=(url,)) for _ in range(6) ]
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertGreaterEqual(elapsed, 0.35)
+
+        host = self.server.url[len("http://"):]
+        self.assertEqual(client.stats()[host]["throttled"], 4)
+        self.assertAlmostEqual(client.stats()[host]["max_wait"], 0.4, delta=0.05)
+
+    def test_timeout(self):
+        gate = threading.Event()
+        def hang(handler):
+            gate.wait(5)
+            return (200, {}, b"too late")
+        self.server.respond = hang
+
+        c = client.Client({ "read-timeout": 0.2, "http-retries": 0 })
+        with self.assertRaises(requests.exceptions.Timeout):
+            c.get(self.server.url + "/scoreboard")
+        gate.set()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@unittest.skipUnless(requests is not None, "requests isn't installed")
+class TestBreaker(unittest.TestCase):
+
+    def test_probes(self):
+        clock = FakeClock()
+        b = client.Breaker("ctf.example", threshold=2, cooldown=10, clock=clock)
+
+        b.failure()
+        self.assertTrue(b.allow())
+        b.failure()
+        self.assertEqual(b.state(), "open")
+        self.assertFalse(b.allow())
+
+        # One probe after the cooldown, and nothing else while it's out
+        clock.now = 10
+        self.assertTrue(b.allow())
+        self.assertFalse(b.allow())
+
+        # The probe failed, so the next one is further away
+        b.failure()
+        clock.now = 25
+        self.assertFalse(b.allow())
+        clock.now = 30
+        self.assertTrue(b.allow())
+
+        # And it's back
+        b.success()
+        self.assertEqual(b.state(), "closed")
+        self.assertTrue(b.allow())
+        self.assertTrue(b.allow())
+
+@unittest.skipUnless(requests is not None, "requests isn't installed")
+class TestTokenBucket(unittest.TestCase):
+
+    def test_take(self):
+        clock = FakeClock()
+        slept = []
+        bucket = client.TokenBucket(rate=2, burst=3, clock=clock, sleep=slept.append)
+
+        self.assertEqual([ bucket.take() for _ in range(5) ], [ 0, 0, 0, 0.5, 1.0 ])
+        self.assertEqual(slept, [ 0.5, 1.0 ])
+
+        # Tokens come back over time, up to the burst
+        clock.now = 100
+        self.assertEqual([ bucket.take() for _ in range(4) ], [ 0, 0, 0, 0.5 ])
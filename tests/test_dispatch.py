@@ -0,0 +1,160 @@
+import threading
+import time
+import unittest
+
+from types import MappingProxyType
+
+from middleend.dispatch import Dispatcher
+from middleend.event import tag, untag
+
+def score_event(tid, old, new):
+    return ("score", MappingProxyType({ "team_id": tid, "old_score": old, "score": new }))
+
+def solve_event(tid, cid):
+    return ("solve", MappingProxyType({ "team_id": tid, "challenge_id": cid, "first": False }))
+
+def reorder_event(places, old_places):
+    return ("reorder", MappingProxyType({ "places": MappingProxyType(places),
+                                          "old_places": MappingProxyType(old_places) }))
+
+# A frontend which is stuck until we say so
+class SlowFrontEnd:
+    def __init__(self):
+        self.log = []
+        self.gate = threading.Event()
+        self.got_one = threading.Event()
+
+    def handle_event(self, event):
+        self.got_one.set()
+        self.gate.wait()
+        self.log.append(event)
+
+class TestDispatcher(unittest.TestCase):
+
+    def wait_for(self, front, count):
+        for _ in range(200):
+            if len(front.log) >= count: return
+            time.sleep(0.01)
+
+    def test_coalesce(self):
+        front = SlowFrontEnd()
+        disp = Dispatcher(front, 10)
+        disp.start()
+
+        # The frontend is busy with this one while the others queue up
+        disp.put(solve_event("T1", "cha1"))
+        front.got_one.wait(2)
+
+        disp.put(score_event("T1", 0, 10))
+        disp.put(solve_event("T2", "cha1"))
+        disp.put(score_event("T1", 10, 20))
+        disp.put(score_event("T1", 20, 35))
+
+        front.gate.set()
+        self.wait_for(front, 3)
+        disp.stop()
+
+        self.assertEqual([ m for m,_ in front.log ], [ "solve", "score", "solve" ])
+
+        # The three score changes became one
+        msg,data = front.log[1]
+        self.assertEqual(data["old_score"], 0)
+        self.assertEqual(data["score"], 35)
+        self.assertEqual(disp.stats["coalesced"], 2)
+
+    def test_delta(self):
+        front = SlowFrontEnd()
+        disp = Dispatcher(front, 10)
+        disp.start()
+
+        disp.put(solve_event("T1", "cha1"))
+        front.got_one.wait(2)
+
+        # Two deltas pile up while the frontend is busy.
+        # It gets a single delta with the latest score.
+        disp.put(("delta", MappingProxyType({ "events": ( score_event("T1", 0, 10), solve_event("T2", "cha1") ) })))
+        disp.put(("delta", MappingProxyType({ "events": ( score_event("T1", 10, 20), ) })))
+
+        front.gate.set()
+        self.wait_for(front, 2)
+        disp.stop()
+
+        self.assertEqual(len(front.log), 2)
+        msg,data = front.log[1]
+        self.assertEqual(msg, "delta")
+        self.assertEqual([ m for m,_ in data["events"] ], [ "score", "solve" ])
+        self.assertEqual(data["events"][0][1]["score"], 20)
+
+    # A reorder never jumps ahead of a team it moves
+    def test_reorder_barrier(self):
+        front = SlowFrontEnd()
+        disp = Dispatcher(front, 10)
+        disp.start()
+
+        disp.put(solve_event("T1", "cha1"))
+        front.got_one.wait(2)
+
+        disp.put(reorder_event({ "A": 1 }, { "A": 2 }))
+        disp.put(("new_team", MappingProxyType({ "team_id": "X", "name": "X", "score": 0, "place": 50 })))
+        disp.put(reorder_event({ "X": 3 }, { "X": 50 }))
+        disp.put(reorder_event({ "X": 2 }, { "X": 3 }))
+
+        front.gate.set()
+        self.wait_for(front, 4)
+        disp.stop()
+
+        self.assertEqual([ m for m,_ in front.log ], [ "solve", "reorder", "new_team", "reorder" ])
+        self.assertEqual(dict(front.log[1][1]["places"]), { "A": 1 })
+
+        # Reorders after the team arrived are still merged
+        self.assertEqual(dict(front.log[3][1]["places"]), { "X": 2 })
+        self.assertEqual(dict(front.log[3][1]["old_places"]), { "X": 50 })
+
+    # Events from different CTFs are never merged
+    def test_tagged(self):
+        front = SlowFrontEnd()
+        disp = Dispatcher(front, 10)
+        disp.start()
+
+        disp.put(tag("one", solve_event("T1", "cha1")))
+        front.got_one.wait(2)
+
+        disp.put(tag("one", score_event("T1", 0, 10)))
+        disp.put(tag("two", score_event("T1", 0, 5)))
+        disp.put(tag("one", score_event("T1", 10, 20)))
+
+        front.gate.set()
+        self.wait_for(front, 3)
+        disp.stop()
+
+        events = [ untag(e) for e in front.log ]
+        self.assertEqual([ (ctf,msg) for ctf,(msg,_) in events ],
+                         [ ("one", "solve"), ("one", "score"), ("two", "score") ])
+        self.assertEqual(events[1][1][1]["score"], 20)
+        self.assertEqual(events[2][1][1]["score"], 5)
+
+    def test_full(self):
+        front = SlowFrontEnd()
+        disp = Dispatcher(front, 3)
+        disp.start()
+
+        disp.put(solve_event("T1", "cha1"))
+        front.got_one.wait(2)
+
+        # The frontend is stuck, but putting never waits for it.
+        # The oldest scores make room, the solves are all kept.
+        for i in range(5):
+            disp.put(score_event("T%d" % i, 0, 10))
+        disp.put(solve_event("T2", "cha1"))
+        disp.put(solve_event("T3", "cha1"))
+
+        self.assertEqual(disp.stats["dropped"], 4)
+        self.assertEqual(disp.stats["overflow"], 0)
+
+        # Whatever is queued is delivered before stop() returns
+        front.gate.set()
+        disp.stop()
+
+        self.assertEqual([ (m, d["team_id"]) for m,d in front.log ],
+                         [ ("solve", "T1"), ("score", "T4"), ("solve", "T2"), ("solve", "T3") ])
+        self.assertFalse(disp.thread)
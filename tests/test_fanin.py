@@ -0,0 +1,37 @@
+import unittest
+
+from copy import deepcopy as CP
+
+from middleend.event import untag
+from middleend.fanin import FanIn
+
+from tests.test_middleend import LogFrontEnd, dummy_team_1, dummy_team_2
+
+class TestFanIn(unittest.TestCase):
+
+    def test_two_ctfs(self):
+        front = LogFrontEnd()
+        fanin = FanIn({}, front)
+        one = fanin.add("one", {})
+        two = fanin.add("two", {})
+
+        one.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+        two.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_1 ] })))
+
+        # The same team id in both CTFs, but each has a state of its own
+        t_1 = CP(dummy_team_1)
+        t_1["score"] = 99
+        two.handle_snapshot(CP(("scoreboard", { "scores" : [ t_1 ] })))
+
+        self.assertEqual(one.state.team(t_1["team_id"])["score"], dummy_team_1["score"])
+        self.assertEqual(two.state.team(t_1["team_id"])["score"], 99)
+
+        events = [ untag(e) for e in front.log ]
+        self.assertEqual([ (ctf,msg) for ctf,(msg,_) in events ],
+                         [ ("one", "boot"), ("two", "boot"), ("two", "score") ])
+
+        self.assertEqual(len(events[0][1][1]["scoreboard"]["scores"]), 2)
+        self.assertEqual(events[2][1][1]["score"], 99)
+
+        with self.assertRaises(ValueError):
+            fanin.add("one", {})
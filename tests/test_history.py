@@ -0,0 +1,86 @@
+import unittest
+
+from copy import deepcopy as CP
+
+from middleend.basic import MiddleEnd
+from middleend.history import History
+
+from tests.test_middleend import LogFrontEnd, dummy_team_1, dummy_team_2
+
+class TestHistory(unittest.TestCase):
+
+    def test_points(self):
+        hist = History(16)
+        for t in range(10):
+            hist.record("T1", float(t), t * 10, 20 - t)
+
+        self.assertEqual(hist.points("T1", since=3, until=5),
+                         ((3.0, 30, 17), (4.0, 40, 16), (5.0, 50, 15)))
+
+        self.assertEqual(hist.points("nobody"), ())
+
+        self.assertEqual(hist.delta("T1", 4.5), 50)
+        self.assertEqual(hist.delta("T1", 2, until=4), 20)
+
+        # Showed up after the start, so everything counts
+        hist.record("T2", 5.0, 500, 1)
+        self.assertEqual(hist.delta("T2", 1), 500)
+        self.assertEqual(hist.movers(1, 1), [ ("T2", 500) ])
+
+        # Integer scores come back as ints, fractional ones as floats
+        self.assertIs(type(hist.points("T1")[0][1]), int)
+        self.assertIs(type(hist.delta("T1", 4.5)), int)
+        hist.record("T1", 10.0, 100.5, 10)
+        self.assertEqual(hist.points("T1", since=10), ((10.0, 100.5, 10),))
+
+    def test_downsample(self):
+        hist = History(8)
+        for t in range(1000):
+            hist.record("T1", float(t), t, None)
+
+        points = hist.points("T1")
+        self.assertLessEqual(len(points), 8)
+
+        # The first and the latest are still there, and the rest are in order
+        self.assertEqual(points[0], (0.0, 0, None))
+        self.assertEqual(points[-1], (999.0, 999, None))
+        self.assertEqual(list(points), sorted(points))
+        self.assertEqual(hist.delta("T1", 0), 999)
+
+    # Teams only take up as much room as they have points
+    def test_growth(self):
+        hist = History(128)
+        hist.record("T1", 1.0, 10, 1)
+        self.assertEqual(len(hist.teams["T1"].times), 1)
+
+        for t in range(2, 50):
+            hist.record("T1", float(t), t, 1)
+        self.assertEqual(len(hist.teams["T1"].times), 49)
+
+    # Nobody asked for it
+    def test_off(self):
+        mid = MiddleEnd({}, LogFrontEnd())
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        self.assertIsNone(mid.history)
+        self.assertEqual(mid.score_history(dummy_team_1["team_id"]), ())
+
+    def test_middleend(self):
+        mid = MiddleEnd({ "history-points": 128 }, LogFrontEnd())
+
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+        start = mid.now
+
+        t_1 = CP(dummy_team_1)
+        t_1["score"] = 99
+        t_1["place"] = 1
+        t_2 = CP(dummy_team_2)
+        t_2["place"] = 2
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_1, t_2 ] })))
+
+        self.assertEqual([ (s,p) for _,s,p in mid.score_history(t_1["team_id"]) ], [ (25, 2), (99, 1) ])
+        self.assertEqual(mid.score_delta(t_1["team_id"], start), 74)
+
+        movers = mid.biggest_movers(start, 1)
+        self.assertEqual(movers[0][0]["team_id"], t_1["team_id"])
+        self.assertEqual(movers[0][1], 74)
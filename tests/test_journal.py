@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import unittest
+
+from copy import deepcopy as CP
+
+from middleend.basic import MiddleEnd
+from middleend.journal import Journal, read_journal
+
+from tests.test_middleend import LogFrontEnd, dummy_team_1, dummy_team_2, dummy_chall_1
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "events")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        front = LogFrontEnd()
+        mid = MiddleEnd({ "journal": self.path }, front)
+        mid.start()
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        t_1 = CP(dummy_team_1)
+        t_1["score"] = 99
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_1 ] })))
+
+        mid.stop()
+
+        records = list(read_journal(self.path))
+        self.assertEqual([ e[0] for _,e in records ], [ "boot", "score" ])
+        self.assertEqual(records[0][1][1]["scoreboard"]["scores"], [ dummy_team_2, dummy_team_1 ])
+        self.assertEqual(records[1][1][1], { "team_id": t_1["team_id"], "old_score": 25, "score": 99 })
+
+    def test_rotate(self):
+        journal = Journal(self.path, max_bytes=200, keep=3)
+        journal.start()
+        for i in range(50):
+            journal.write(("score", { "team_id": "T1", "old_score": i, "score": i+1 }))
+        journal.stop()
+
+        segments = [ name for name in os.listdir(self.tmp.name) if name.endswith(".gz") ]
+        self.assertEqual(len(segments), 3)
+
+        # The oldest ones are gone, but what's left is in order
+        scores = [ e[1]["score"] for _,e in read_journal(self.path) ]
+        self.assertEqual(scores[-1], 50)
+        self.assertEqual(scores, list(range(scores[0], 51)))
+
+        # A restart continues in a new segment, after the old ones
+        journal = Journal(self.path, max_bytes=200, keep=3)
+        journal.start()
+        journal.write(("score", { "team_id": "T1", "old_score": 50, "score": 51 }))
+        journal.stop()
+
+        scores = [ e[1]["score"] for _,e in read_journal(self.path) ]
+        self.assertEqual(scores[-1], 51)
+
+    # The segment being written has no gzip trailer yet,
+    # but what has been flushed can be read
+    def test_live(self):
+        journal = Journal(self.path)
+        journal.start()
+        for i in range(3):
+            journal.write(("score", { "team_id": "T1", "old_score": i, "score": i+1 }))
+
+        scores = []
+        for _ in range(200):
+            scores = [ e[1]["score"] for _,e in read_journal(self.path) ]
+            if len(scores) == 3: break
+            time.sleep(0.01)
+        self.assertEqual(scores, [ 1, 2, 3 ])
+
+        journal.stop()
@@ -1,6 +1,9 @@
+import threading
 import unittest
 
 from middleend.basic import MiddleEnd
+from middleend.event import thaw
+from middleend.subscription import Subscription
 from copy import deepcopy as CP
 
 dummy_chall_1 = {
@@ -57,6 +60,15 @@ class LogFrontEnd:
     def sort_events(self):
         self.log = list(sorted(self.log, key=lambda x: x[0]))
 
+# Only wants some of the events
+class PickyFrontEnd(LogFrontEnd):
+    def __init__(self, sub):
+        super().__init__(skip_boot=True)
+        self.sub = sub
+
+    def subscription(self):
+        return self.sub
+
 class TestMiddleEnd(unittest.TestCase):
 
     def conf(self):
@@ -86,11 +98,36 @@ class TestMiddleEnd(unittest.TestCase):
         self.assertEqual(msg, "boot")
 
         self.assertTrue("challenges" in data)
-        self.assertEqual(data["challenges"], { "challenges" : [ dummy_chall_1 ] })
+        self.assertEqual(thaw(data["challenges"]), { "challenges" : [ dummy_chall_1 ] })
 
         self.assertTrue("scoreboard" in data)
-        self.assertEqual(data["scoreboard"], { "scores" : [ dummy_team_2, dummy_team_1 ] })
+        self.assertEqual(thaw(data["scoreboard"]), { "scores" : [ dummy_team_2, dummy_team_1 ] })
+
+
+    # All frontends share the same event objects, so they must not be
+    # able to modify them (or the middle-end state behind them)
+    def test_frozen_events(self):
+        front_a = LogFrontEnd()
+        front_b = LogFrontEnd()
+        mid = MiddleEnd(self.conf(), [ front_a, front_b ])
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        self.assertIs(front_a.log[0], front_b.log[0])
+
+        msg,data = front_a.log[0]
+        team = data["scoreboard"]["scores"][0]
+        chall = data["challenges"]["challenges"][0]
+
+        with self.assertRaises(TypeError):
+            team["score"] = 9999
 
+        with self.assertRaises(AttributeError):
+            chall["solves"].append("T666")
+
+        self.assertEqual(mid.ctfstate["scoreboard"]["scores"][0]["score"], dummy_team_2["score"])
+        self.assertEqual(len(mid.ctfstate["challenges"]["challenges"][0]["solves"]), 0)
 
     def test_firstblood(self):
         front = LogFrontEnd(skip_boot = True)
@@ -268,3 +305,312 @@ class TestMiddleEnd(unittest.TestCase):
         self.assertEqual(data["old_place"], 1)
         self.assertEqual(data["place"], 2)
 
+
+    # The middle-end keeps its own ordered view of the scoreboard,
+    # regardless of the order the backend reports the teams in.
+    def test_state_order(self):
+        front = LogFrontEnd(skip_boot = True)
+        mid = MiddleEnd(self.conf(), front)
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_2, dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_3, dummy_team_1, dummy_team_2 ] })))
+
+        scores = mid.ctfstate["scoreboard"]["scores"]
+        self.assertEqual([ t["team_id"] for t in scores ],
+                         [ dummy_team_2["team_id"], dummy_team_1["team_id"], dummy_team_3["team_id"] ])
+
+        challs = mid.ctfstate["challenges"]["challenges"]
+        self.assertEqual([ c["challenge_id"] for c in challs ],
+                         [ dummy_chall_1["challenge_id"], dummy_chall_2["challenge_id"] ])
+
+        # Teams swapping places are picked up without duplicating entries
+        t_1 = CP(dummy_team_1)
+        t_3 = CP(dummy_team_3)
+        t_1["place"] = 3
+        t_3["place"] = 2
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_3, t_1 ] })))
+
+        scores = mid.ctfstate["scoreboard"]["scores"]
+        self.assertEqual([ t["team_id"] for t in scores ],
+                         [ dummy_team_2["team_id"], dummy_team_3["team_id"], dummy_team_1["team_id"] ])
+
+    # With reorder events, a team climbing over several others
+    # produces one event for the whole shift
+    def test_reorder(self):
+        front = LogFrontEnd(skip_boot = True)
+        mid = MiddleEnd({ "reorder-events": True }, front)
+
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1, dummy_team_3 ] })))
+        self.assertEqual(front.log, [])
+
+        t_1 = CP(dummy_team_1)
+        t_2 = CP(dummy_team_2)
+        t_3 = CP(dummy_team_3)
+        t_3["place"] = 1
+        t_2["place"] = 2
+        t_1["place"] = 3
+
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_3, t_2, t_1 ] })))
+
+        self.assertEqual(len(front.log), 1)
+
+        msg,data = front.log[0]
+        self.assertEqual(msg, "reorder")
+        self.assertEqual(dict(data["places"]), {
+                            t_3["team_id"]: 1,
+                            t_2["team_id"]: 2,
+                            t_1["team_id"]: 3,
+                         })
+        self.assertEqual(dict(data["old_places"]), {
+                            t_3["team_id"]: 3,
+                            t_2["team_id"]: 1,
+                            t_1["team_id"]: 2,
+                         })
+
+        # Nothing moved, nothing to say
+        front.log = []
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_3, t_2, t_1 ] })))
+        self.assertEqual(front.log, [])
+
+    # In batch mode, everything from one snapshot arrives as a single delta
+    def test_delta(self):
+        front = LogFrontEnd()
+        mid = MiddleEnd({ "batch-events": True }, front)
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        # The boot event is never batched
+        self.assertEqual(len(front.log), 1)
+        self.assertEqual(front.log[0][0], "boot")
+        front.log = []
+
+        t_1 = CP(dummy_team_1)
+        t_2 = CP(dummy_team_2)
+        t_1["place"] = 1
+        t_1["score"] = 50
+        t_2["place"] = 2
+
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_1, t_2, dummy_team_3 ] })))
+
+        self.assertEqual(len(front.log), 1)
+        msg,data = front.log[0]
+        self.assertEqual(msg, "delta")
+
+        events = data["events"]
+        self.assertEqual([ m for m,_ in events ], [ "score", "place", "place", "new_team" ])
+        self.assertEqual(events[0][1]["score"], 50)
+        self.assertEqual(events[3][1]["team_id"], dummy_team_3["team_id"])
+
+        # A snapshot without changes doesn't produce an empty delta
+        front.log = []
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_1, t_2, dummy_team_3 ] })))
+        self.assertEqual(front.log, [])
+
+    # Identical snapshots are recognized and skipped
+    def test_fingerprint(self):
+        front = LogFrontEnd(skip_boot = True)
+        mid = MiddleEnd(self.conf(), front)
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        for _ in range(3):
+            mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+            mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        self.assertEqual(front.log, [])
+        self.assertEqual(mid.snapshot_stats["scoreboard"], { "processed": 1, "skipped": 3 })
+        self.assertEqual(mid.snapshot_stats["challenges"], { "processed": 1, "skipped": 3 })
+
+        # A change is still a change
+        t_1 = CP(dummy_team_1)
+        t_1["score"] = 100
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_1 ] })))
+
+        self.assertEqual(len(front.log), 1)
+        msg,data = front.log[0]
+        self.assertEqual(msg, "score")
+        self.assertEqual(data["score"], 100)
+        self.assertEqual(mid.snapshot_stats["scoreboard"], { "processed": 2, "skipped": 3 })
+
+    # Only the very first solver of a challenge gets first blood,
+    # even when several solves show up in the same snapshot
+    def test_firstblood_burst(self):
+        front = LogFrontEnd(skip_boot = True)
+        mid = MiddleEnd(self.conf(), front)
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1, dummy_team_3 ] })))
+
+        new_chall_1 = CP(dummy_chall_1)
+        new_chall_1["solves"] = [ dummy_team_3["team_id"], dummy_team_1["team_id"], dummy_team_2["team_id"] ]
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ new_chall_1 ] })))
+
+        self.assertEqual([ (d["team_id"], d["first"]) for _,d in front.log ],
+                         [ (dummy_team_3["team_id"], True),
+                           (dummy_team_1["team_id"], False),
+                           (dummy_team_2["team_id"], False) ])
+
+        # Lots of solvers later, the new ones are still picked out
+        front.log = []
+        new_chall_1 = CP(new_chall_1)
+        new_chall_1["solves"] += [ f"S{n}" for n in range(1500) ]
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ new_chall_1 ] })))
+
+        self.assertEqual(len(front.log), 1500)
+        self.assertEqual(front.log[0][1]["team_id"], "S0")
+        self.assertFalse(any(d["first"] for _,d in front.log))
+
+    # A solver disappearing and another turning up leaves the count as it was
+    def test_solve_swap(self):
+        front = LogFrontEnd(skip_boot = True)
+        mid = MiddleEnd(self.conf(), front)
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1, dummy_team_3 ] })))
+
+        new_chall_1 = CP(dummy_chall_1)
+        for solves in [ [ "A", "B", "C" ], [ "A", "B" ], [ "A", "B", "D" ] ]:
+            new_chall_1["solves"] = solves
+            mid.handle_snapshot(CP(("challenges", { "challenges" : [ new_chall_1 ] })))
+
+        self.assertEqual([ d["team_id"] for m,d in front.log if m == "solve" ], [ "A", "B", "C", "D" ])
+
+    def test_queries(self):
+        front = LogFrontEnd(skip_boot = True)
+        mid = MiddleEnd(self.conf(), front)
+
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_3, dummy_team_1, dummy_team_2 ] })))
+
+        self.assertEqual([ t["team_id"] for t in mid.top(2) ], [ dummy_team_2["team_id"], dummy_team_1["team_id"] ])
+        self.assertEqual(mid.rank(dummy_team_3["team_id"]), 3)
+
+        above,below = mid.neighbours(dummy_team_1["team_id"])
+        self.assertEqual([ t["team_id"] for t in above ], [ dummy_team_2["team_id"] ])
+        self.assertEqual([ t["team_id"] for t in below ], [ dummy_team_3["team_id"] ])
+
+    # Backends can send only what changed
+    def test_patches(self):
+        front = LogFrontEnd(skip_boot = True)
+        mid = MiddleEnd(self.conf(), front)
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        # Team 1 scored, nobody else is mentioned
+        mid.handle_snapshot(("scoreboard_patch", { "scores" : [ { "team_id": dummy_team_1["team_id"], "score": 77 } ] }))
+
+        self.assertEqual(len(front.log), 1)
+        msg,data = front.log[0]
+        self.assertEqual(msg, "score")
+        self.assertEqual(data["old_score"], dummy_team_1["score"])
+        self.assertEqual(data["score"], 77)
+
+        # Only new solves are sent for the challenge
+        front.log = []
+        mid.handle_snapshot(("challenges_patch", { "challenges" : [
+            { "challenge_id": dummy_chall_1["challenge_id"], "new_solves": [ dummy_team_1["team_id"] ] },
+            { "challenge_id": "cha9", "name": "Late arrival", "new_solves": [ dummy_team_2["team_id"] ] },
+        ] }))
+
+        self.assertEqual([ m for m,_ in front.log ], [ "solve", "new_challenge" ])
+        self.assertEqual(front.log[0][1]["team_id"], dummy_team_1["team_id"])
+        self.assertTrue(front.log[0][1]["first"])
+        self.assertEqual(front.log[1][1]["solves"], ( dummy_team_2["team_id"], ))
+
+        self.assertEqual(thaw(mid.ctfstate["challenges"]["challenges"][0]["solves"]), [ dummy_team_1["team_id"] ])
+        self.assertEqual(mid.ctfstate["scoreboard"]["scores"][1]["score"], 77)
+
+        # A full snapshot afterwards which matches the patched state is quiet,
+        # even though it's identical to the last full snapshot
+        front.log = []
+        new_chall_1 = CP(dummy_chall_1)
+        new_chall_1["solves"] = [ dummy_team_1["team_id"] ]
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ new_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        # ...except that team 1's score went back to what the full snapshot says
+        self.assertEqual(len(front.log), 1)
+        self.assertEqual(front.log[0][0], "score")
+        self.assertEqual(front.log[0][1]["score"], dummy_team_1["score"])
+
+    def test_subscriptions(self):
+        everything = LogFrontEnd(skip_boot=True)
+        no_solves = PickyFrontEnd(Subscription(events=[ "score", "place", "new_team" ]))
+        top_one = PickyFrontEnd(Subscription(top=1))
+        mid = MiddleEnd({}, [ everything, no_solves, top_one ])
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1, dummy_team_3 ] })))
+
+        # Team 3 passes everyone, but only moves into the top one's view
+        t_1 = CP(dummy_team_1)
+        t_2 = CP(dummy_team_2)
+        t_3 = CP(dummy_team_3)
+        t_3["place"] = 1
+        t_2["place"] = 2
+        t_1["place"] = 3
+        t_1["score"] = 30
+        c_1 = CP(dummy_chall_1)
+        c_1["solves"] = [ t_1["team_id"] ]
+
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_3, t_2, t_1 ] })))
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ c_1 ] })))
+
+        self.assertEqual([ m for m,_ in everything.log ], [ "place", "place", "score", "place", "solve" ])
+        self.assertEqual([ m for m,_ in no_solves.log ], [ "place", "place", "score", "place" ])
+
+        # Team 3 comes into view with its current data, team 2 leaves it,
+        # and team 1 is out of view the whole time.
+        msgs = [ m for m,_ in top_one.log ]
+        self.assertEqual(msgs, [ "delta", "place" ])
+
+        entering = top_one.log[0][1]["events"]
+        self.assertEqual([ m for m,_ in entering ], [ "new_team", "place" ])
+        self.assertEqual(entering[0][1]["team_id"], t_3["team_id"])
+        self.assertEqual(entering[0][1]["place"], 1)
+
+        self.assertEqual(top_one.log[1][1]["team_id"], t_2["team_id"])
+
+        # Nobody wants solves, so they aren't even built
+        picky = PickyFrontEnd(Subscription(events=[ "score" ]))
+        mid = MiddleEnd({}, picky)
+        self.assertFalse(mid._wants("solve"))
+        self.assertTrue(mid._wants("score"))
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_1 ] })))
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ c_1 ] })))
+        self.assertEqual(picky.log, [])
+
+        # ...but the state is still kept up to date
+        self.assertEqual(mid.state.challenge(c_1["challenge_id"])["solves"], (t_1["team_id"],))
+
+    # Once started, snapshots can come from any thread
+    # and are applied one at a time, in order
+    def test_ingest(self):
+        front = LogFrontEnd(skip_boot=True)
+        mid = MiddleEnd(self.conf(), front)
+        mid.start()
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ dummy_chall_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_1 ] })))
+
+        def solver(n):
+            c_1 = CP(dummy_chall_1)
+            c_1["solves"] = [ f"S{i}" for i in range(n) ]
+            mid.handle_snapshot(("challenges", { "challenges" : [ c_1 ] }))
+
+        threads = [ threading.Thread(target=solver, args=(n,)) for n in range(1, 21) ]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        mid.stop()
+
+        # However the snapshots got interleaved, every solve is reported
+        # exactly once, and only the very first one is a first blood
+        solves = [ d for m,d in front.log if m == "solve" ]
+        self.assertEqual(sorted(d["team_id"] for d in solves), sorted(f"S{i}" for i in range(20)))
+        self.assertEqual([ d["first"] for d in solves ], [ True ] + [ False ] * 19)
+        self.assertEqual(list(mid.state.solves[dummy_chall_1["challenge_id"]]),
+                         [ d["team_id"] for d in solves ])
@@ -0,0 +1,80 @@
+import unittest
+
+from copy import deepcopy as CP
+
+from middleend.basic import MiddleEnd
+from middleend.normalize import parse_number
+
+from tests.test_middleend import LogFrontEnd, dummy_team_1, dummy_team_2, dummy_chall_1
+
+class TestNormalize(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_number(1337), 1337)
+        self.assertEqual(parse_number("1337"), 1337)
+        self.assertEqual(parse_number(" 1,337 "), 1337)
+        self.assertEqual(parse_number("1 337 000"), 1337000)
+        self.assertEqual(parse_number("-20"), -20)
+        self.assertEqual(parse_number("25.00"), 25)
+        self.assertEqual(parse_number(25.0), 25)
+        self.assertEqual(parse_number("12.5"), 12.5)
+
+        self.assertIsNone(parse_number(""))
+        self.assertIsNone(parse_number("1,33"))
+        self.assertIsNone(parse_number("lots"))
+        self.assertIsNone(parse_number(None))
+
+    def test_middleend(self):
+        front = LogFrontEnd(skip_boot=True)
+        mid = MiddleEnd({}, front)
+
+        t_1 = CP(dummy_team_1)
+        t_2 = CP(dummy_team_2)
+        t_1["score"] = "1,025"
+        t_2["score"] = "12"
+        c_1 = CP(dummy_chall_1)
+        c_1["points"] = "500"
+
+        mid.handle_snapshot(CP(("challenges", { "challenges" : [ c_1 ] })))
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_2, t_1 ] })))
+
+        self.assertEqual(mid.state.team(t_1["team_id"])["score"], 1025)
+        self.assertEqual(mid.state.challenge(c_1["challenge_id"])["points"], 500)
+
+        # The same value as a string and as an int is no change
+        t_1["score"] = 1025
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_2, t_1 ] })))
+        self.assertEqual(front.log, [])
+
+        # Garbage is treated as unknown, and only complained about once
+        t_1["score"] = "N/A"
+        t_2["score"] = "?"
+        with self.assertLogs("middleend.normalize", level="WARNING") as logs:
+            mid.handle_snapshot(CP(("scoreboard", { "scores" : [ t_2, t_1 ] })))
+        self.assertEqual(len(logs.output), 1)
+
+        self.assertEqual(front.log, [])
+        self.assertEqual(mid.state.team(t_1["team_id"])["score"], 1025)
+
+    # An unchanged snapshot is skipped before anything gets parsed
+    def test_skip_first(self):
+        mid = MiddleEnd({}, LogFrontEnd(skip_boot=True))
+
+        t_1 = CP(dummy_team_1)
+        t_1["score"] = "1,025"
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_1 ] })))
+
+        parsed = []
+        rows = mid.normalizer.rows
+        mid.normalizer.rows = lambda kind, r: parsed.append(kind) or rows(kind, r)
+
+        for _ in range(3):
+            mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_1 ] })))
+        self.assertEqual(parsed, [])
+        self.assertEqual(mid.snapshot_stats["scoreboard"]["skipped"], 3)
+
+        # A changed one is still parsed
+        t_1["score"] = "2,000"
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_1 ] })))
+        self.assertEqual(parsed, [ "scoreboard" ])
+        self.assertEqual(mid.state.team(t_1["team_id"])["score"], 2000)
@@ -0,0 +1,80 @@
+import random
+import unittest
+
+from middleend.ranking import Ranking
+
+class TestRanking(unittest.TestCase):
+
+    def test_order(self):
+        r = Ranking()
+        r.update("a", 3)
+        r.update("b", 1)
+        r.update("c", 2)
+
+        self.assertEqual(list(r), [ "b", "c", "a" ])
+        self.assertEqual(r.rank("a"), 3)
+        self.assertEqual(r.rank("nobody"), None)
+
+        # a climbs to the top, the others shift down
+        r.update("a", 1)
+        r.update("b", 2)
+        r.update("c", 3)
+        self.assertEqual(list(r), [ "a", "b", "c" ])
+        self.assertEqual(r.top(2), [ "a", "b" ])
+        self.assertEqual(r.neighbours("b"), ([ "a" ], [ "c" ]))
+        self.assertEqual(r.neighbours("a", 5), ([], [ "b", "c" ]))
+
+        r.remove("b")
+        self.assertEqual(list(r), [ "a", "c" ])
+        self.assertEqual(len(r), 2)
+
+    # Shared places keep the order in which the teams got there
+    def test_ties(self):
+        r = Ranking()
+        r.update("a", 1)
+        r.update("b", 2)
+        r.update("c", 2)
+        self.assertEqual(list(r), [ "a", "b", "c" ])
+
+        # Setting the same place again is not a move
+        r.update("b", 2)
+        self.assertEqual(list(r), [ "a", "b", "c" ])
+
+    # Lots of random moves should still end up in the same order as a sort
+    def test_random(self):
+        rng = random.Random(1337)
+        r = Ranking()
+        places = {}
+
+        for _ in range(2000):
+            tid = rng.randrange(300)
+            place = rng.randrange(1, 300)
+            r.update(tid, place)
+            places[tid] = place
+
+        self.assertEqual([ places[tid] for tid in r ], sorted(places.values()))
+        for tid in places:
+            self.assertEqual(list(r)[r.rank(tid) - 1], tid)
+
+    # Big batches of moves are sorted in one go, small ones put in place,
+    # and either way the order is the same as a sort
+    def test_batches(self):
+        rng = random.Random(42)
+        r = Ranking()
+        places = {}
+
+        for batch in [ 5000, 3, 100, 1, 2500, 70, 0 ]:
+            for _ in range(batch):
+                tid = rng.randrange(3000)
+                if rng.random() < 0.05:
+                    r.remove(tid)
+                    places.pop(tid, None)
+                else:
+                    place = rng.randrange(1, 3000)
+                    r.update(tid, place)
+                    places[tid] = place
+
+            self.assertEqual(len(r), len(places))
+            self.assertEqual([ places[tid] for tid in r ], sorted(places.values()))
+            for tid in list(places)[:50]:
+                self.assertEqual(r.top(len(places))[r.rank(tid) - 1], tid)
@@ -0,0 +1,51 @@
+import unittest
+
+from middleend.records import Team, Challenge
+
+class TestRecords(unittest.TestCase):
+
+    def test_mapping(self):
+        row = { "team_id": "T12345", "name": "Team 1", "place": 2, "score": 25 }
+        t = Team(row)
+
+        self.assertEqual(t, row)
+        self.assertEqual(dict(t), row)
+        self.assertEqual(t["name"], "Team 1")
+        self.assertEqual(len(t), 4)
+
+        with self.assertRaises(TypeError):
+            t["score"] = 100
+
+        with self.assertRaises(AttributeError):
+            t.score = 5
+        with self.assertRaises(AttributeError):
+            del t.name
+        self.assertEqual(t["score"], 25)
+
+    # Fields the backend didn't send are not in the record
+    def test_missing(self):
+        t = Team({ "team_id": "T1", "place": 1 })
+
+        self.assertFalse("score" in t)
+        self.assertEqual(t.get("score", 0), 0)
+        self.assertEqual(list(t), [ "team_id", "place" ])
+        with self.assertRaises(KeyError):
+            t["score"]
+
+    def test_replace(self):
+        t = Team({ "team_id": "T1", "name": "Old", "place": 1, "score": 5 })
+        t2 = t.replace({ "score": 10, "country": "SE" })
+
+        self.assertEqual(t["score"], 5)
+        self.assertEqual(t2["score"], 10)
+        self.assertEqual(t2["name"], "Old")
+        self.assertEqual(t2["country"], "SE")
+
+    # Ids are interned, so the same team in a thousand solve lists is one string
+    def test_interned(self):
+        tid = "".join([ "T", "999" ])
+        c1 = Challenge({ "challenge_id": "c1", "solves": [ tid ] })
+        c2 = Challenge({ "challenge_id": "c2", "solves": [ "".join([ "T", "9", "99" ]) ] })
+
+        self.assertIs(c1["solves"][0], c2["solves"][0])
+        self.assertEqual(c1["solves"], ( tid, ))
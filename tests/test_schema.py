@@ -0,0 +1,61 @@
+import unittest
+
+from copy import deepcopy as CP
+
+from middleend.basic import MiddleEnd
+from middleend.schema import Validator
+
+from tests.test_middleend import LogFrontEnd, dummy_team_1, dummy_team_2, dummy_team_3, dummy_chall_1
+
+class TestSchema(unittest.TestCase):
+
+    def test_good_rows(self):
+        val = Validator()
+        rows = [ CP(dummy_team_1), CP(dummy_team_2) ]
+
+        # Nothing to fix, so nothing is copied
+        self.assertIs(val.rows("scoreboard", rows, True), rows)
+        self.assertEqual(val.stats["scoreboard"], { "rows": 2, "repaired": 0, "dropped": 0 })
+
+    def test_bad_rows(self):
+        val = Validator()
+
+        no_id = CP(dummy_team_3)
+        del no_id["team_id"]
+        no_place = CP(dummy_team_2)
+        del no_place["place"]
+        bad_score = CP(dummy_team_1)
+        bad_score["score"] = [ 12 ]
+
+        with self.assertLogs("middleend.schema", level="WARNING"):
+            rows = val.rows("scoreboard", [ bad_score, no_place, no_id, "garbage" ], True)
+
+        self.assertEqual(len(rows), 2)
+        self.assertNotIn("score", rows[0])
+        self.assertEqual(rows[1]["place"], 2)
+        self.assertEqual(val.stats["scoreboard"], { "rows": 4, "repaired": 2, "dropped": 2 })
+
+        # A patch doesn't have to say where a team is
+        self.assertEqual(val.rows("scoreboard", [ no_place ], False), [ no_place ])
+
+        # Solves which can't be team ids are thrown away
+        chall = CP(dummy_chall_1)
+        chall["solves"] = [ "T1", None, { "team": "T2" }, "T3" ]
+        self.assertEqual(val.rows("challenges", [ chall ], True)[0]["solves"], [ "T1", "T3" ])
+
+        with self.assertLogs("middleend.schema", level="WARNING"):
+            self.assertEqual(val.rows("challenges", None, True), [])
+
+    # A broken row doesn't keep the rest of the scoreboard from updating
+    def test_middleend(self):
+        front = LogFrontEnd(skip_boot=True)
+        mid = MiddleEnd({}, front)
+        mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, dummy_team_1 ] })))
+
+        t_1 = CP(dummy_team_1)
+        t_1["score"] = 99
+        with self.assertLogs("middleend.schema", level="WARNING"):
+            mid.handle_snapshot(CP(("scoreboard", { "scores" : [ dummy_team_2, t_1, { "name": "who?" } ] })))
+
+        self.assertEqual([ m for m,_ in front.log ], [ "score" ])
+        self.assertEqual(mid.validator.stats["scoreboard"]["dropped"], 1)